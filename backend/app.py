@@ -1,44 +1,176 @@
 # backend/app.py
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, stream_with_context
 from flask_cors import CORS
 import boto3
+from botocore.config import Config
+import codecs
 import os
 import json # Ensure json is imported for s3 policy
+import time
+
+from backend.assets import asset_report, prepare_site
+from backend.ingest import INGEST_MAX_BUFFERS, ingest_multipart
+from backend.intents import match_intent, router_stats, run_intent, timed
+from backend.limits import (
+    AGENT_MAX_CONCURRENCY, STREAM_UPLOAD_MAX_CONCURRENCY, UPLOAD_MAX_CONCURRENCY,
+    agent_limit, limited, limits_snapshot, stream_upload_limit, upload_limit,
+)
+from backend.metrics import METRICS_ENABLED, instrument_client, observe_agent_stream, register_gauge, render
+from backend.uploads import MULTIPART_CONCURRENCY, S3_CLIENT_CONFIG, UPLOAD_MAX_WORKERS, sync_files, upload_files
 
 app = Flask(__name__)
 # CORS allows your frontend (running on a different origin) to call this backend
 CORS(app)
 
-# --- IMPORTANT: UPDATE THESE VALUES ---
-# Paste the IDs you received after running the setup.py script.
-AGENT_ID = "UURDQW5DTE"
-AGENT_ALIAS_ID = "1DIM83KAIA"
-REGION = "us-east-1" 
+# --- Agent configuration ---
+# setup.py writes the IDs it created to backend/agent_config.json, which is
+# read here. Environment variables override it, and the values below are
+# only used when neither is present.
+AGENT_CONFIG_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'agent_config.json')
+
+def load_agent_config():
+    try:
+        with open(AGENT_CONFIG_FILE) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+agent_config = load_agent_config()
+AGENT_ID = os.environ.get('AGENT_ID') or agent_config.get('AGENT_ID', "UURDQW5DTE")
+AGENT_ALIAS_ID = os.environ.get('AGENT_ALIAS_ID') or agent_config.get('AGENT_ALIAS_ID', "1DIM83KAIA")
+REGION = os.environ.get('AWS_REGION') or agent_config.get('REGION', "us-east-1")
+# The intent fast path runs the action group's tool functions in this
+# process; their clients use the default region.
+os.environ.setdefault('AWS_DEFAULT_REGION', REGION)
 
 # Initialize the Boto3 client for the Bedrock Agent Runtime
 # This client is specifically for invoking and interacting with agents.
-bedrock_agent_runtime_client = boto3.client(
+# Every admitted agent session holds one connection while its reply
+# streams, so the pool matches the agent concurrency limit.
+bedrock_agent_runtime_client = instrument_client(boto3.client(
     'bedrock-agent-runtime',
-    region_name=REGION
-)
+    region_name=REGION,
+    config=Config(
+        max_pool_connections=AGENT_MAX_CONCURRENCY,
+        tcp_keepalive=True,
+        retries={'max_attempts': 3, 'mode': 'standard'},
+    )
+))
 
 # Initialize the Boto3 client for S3
-# This client is used by the /upload-files endpoint
-s3_client = boto3.client('s3', region_name=REGION)
+# This client is shared by all upload requests and their worker threads, so
+# its pool is sized for every upload request the limits admit at once.
+S3_MAX_POOL_CONNECTIONS = (
+    UPLOAD_MAX_CONCURRENCY * UPLOAD_MAX_WORKERS * MULTIPART_CONCURRENCY
+    + STREAM_UPLOAD_MAX_CONCURRENCY * INGEST_MAX_BUFFERS
+)
+s3_client = instrument_client(boto3.client(
+    's3', region_name=REGION,
+    config=S3_CLIENT_CONFIG.merge(Config(max_pool_connections=S3_MAX_POOL_CONNECTIONS))
+))
+
+# Concurrency limits are read when /metrics is scraped
+def limit_values(field):
+    return lambda: [((name,), stats[field]) for name, stats in limits_snapshot().items()]
+
+register_gauge('cloudcraft_limit_slots', 'Concurrency limit of each endpoint.', ('endpoint',), limit_values('limit'))
+register_gauge('cloudcraft_limit_active', 'Requests currently holding a slot.', ('endpoint',), limit_values('active'))
+register_gauge('cloudcraft_limit_admitted_total', 'Requests admitted by each limit.', ('endpoint',),
+               limit_values('admitted'), kind='counter')
+register_gauge('cloudcraft_limit_rejected_total', 'Requests answered with 429.', ('endpoint',),
+               limit_values('rejected'), kind='counter')
+
+def iter_agent_chunks(event_stream):
+    """
+    Yields the decoded text of every 'chunk' event in a Bedrock agent
+    completion stream, as soon as each one arrives.
+    """
+    # An incremental decoder keeps multi-byte characters intact even if
+    # they are split across two chunks.
+    decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+    for event in event_stream:
+        if 'chunk' in event:
+            text = decoder.decode(event['chunk']['bytes'])
+            if text:
+                yield text
+    tail = decoder.decode(b'', final=True)
+    if tail:
+        yield tail
+
+def stream_agent_response(event_stream, started_at, route='agent'):
+    """
+    Generator for the streaming mode of /invoke-agent.
+    Emits one JSON object per line (NDJSON):
+      {"type": "chunk", "text": "..."}             for every agent chunk
+      {"type": "done", "ttfbMs": .., "totalMs": ..} once the stream ends
+      {"type": "error", "error": "..."}              if the stream breaks
+    """
+    ttfb_ms = None
+    chunk_count = 0
+    try:
+        for text in iter_agent_chunks(event_stream):
+            if ttfb_ms is None:
+                ttfb_ms = round((time.perf_counter() - started_at) * 1000, 1)
+                print(f"Agent time to first chunk: {ttfb_ms} ms")
+            chunk_count += 1
+            yield json.dumps({"type": "chunk", "text": text}) + "\n"
+        total_ms = round((time.perf_counter() - started_at) * 1000, 1)
+        timed(route, started_at)
+        yield json.dumps({"type": "done", "ttfbMs": ttfb_ms, "totalMs": total_ms, "chunks": chunk_count, "route": route}) + "\n"
+    except Exception as e:
+        print(f"Error while streaming agent response: {e}")
+        yield json.dumps({"type": "error", "error": f"Failed to get response from agent: {str(e)}"}) + "\n"
+
+def agent_reply(text, stream, started_at, route):
+    """Returns a finished reply in the same format the agent path uses."""
+    if stream:
+        fake_stream = [{'chunk': {'bytes': text.encode('utf-8')}}]
+        return Response(
+            stream_agent_response(fake_stream, started_at, route),
+            mimetype='application/x-ndjson',
+            headers={'Cache-Control': 'no-cache'}
+        )
+    timed(route, started_at)
+    return jsonify({"response": text, "route": route})
 
 @app.route('/invoke-agent', methods=['POST'])
+@limited(agent_limit)
 def invoke_agent():
     """
     Receives a prompt from the frontend and invokes the Bedrock Agent.
+
+    By default the full reply is returned as one JSON object once the agent
+    finishes. Send "stream": true in the body (or ?stream=1) to get the reply
+    as NDJSON lines that are forwarded as soon as each chunk is decoded.
+
+    Fully specified deploy commands are run directly by the intent fast
+    path (see backend/intents.py) without a Bedrock round trip; send
+    "fastPath": false to always use the agent. If the backend's credentials
+    may not run the tool, the prompt goes to the agent.
     """
     data = request.get_json()
     user_prompt = data.get('prompt')
     # The session ID helps the agent remember the context of the conversation
     session_id = data.get('sessionId', 'default-session')
+    stream = bool(data.get('stream')) or request.args.get('stream') in ('1', 'true')
 
     if not user_prompt:
         return jsonify({"error": "Prompt is required"}), 400
 
+    started_at = time.perf_counter()
+    intent = match_intent(user_prompt) if data.get('fastPath', True) else None
+    if intent is not None:
+        tool, args = intent
+        print(f"Fast path: {tool} with arguments: {args}")
+        try:
+            reply = run_intent(tool, args)
+        except Exception as e:
+            print(f"Error running fast path {tool}: {e}")
+            return jsonify({"error": f"Failed to run '{tool}': {str(e)}"}), 500
+        # None means the backend may not run the tool itself; the agent can
+        if reply is not None:
+            return agent_reply(reply, stream, started_at, 'fast_path')
+
     try:
         # Invoke the agent with the user's prompt
         response = bedrock_agent_runtime_client.invoke_agent(
@@ -49,17 +181,21 @@ def invoke_agent():
         )
 
         # The response from the agent is a stream of events.
-        # We need to read this stream to get the final text response.
-        event_stream = response['completion']
-        agent_response = ""
-        for event in event_stream:
-            if 'chunk' in event:
-                chunk = event['chunk']
-                # Decode the chunk of bytes and add it to our full response
-                agent_response += chunk['bytes'].decode('utf-8')
+        event_stream = observe_agent_stream(response['completion'], started_at, 'stream' if stream else 'buffered')
+        if stream:
+            # Forward each chunk to the browser as it arrives
+            return Response(
+                stream_with_context(stream_agent_response(event_stream, started_at)),
+                mimetype='application/x-ndjson',
+                headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+            )
+
+        # Buffered mode: read the whole stream, then return the final text
+        agent_response = "".join(iter_agent_chunks(event_stream))
 
         # Return the complete response from the agent to the frontend
-        return jsonify({"response": agent_response})
+        timed('agent', started_at)
+        return jsonify({"response": agent_response, "route": "agent"})
 
     except Exception as e:
         # Print the error to the console for debugging
@@ -67,10 +203,35 @@ def invoke_agent():
         # Return a generic error message to the frontend
         return jsonify({"error": f"Failed to get response from agent: {str(e)}"}), 500
 
+@app.route('/router-stats', methods=['GET'])
+def get_router_stats():
+    """Hit rate and latency of the intent fast path versus the agent path."""
+    return jsonify(router_stats.snapshot())
+
+@app.route('/limits', methods=['GET'])
+def get_limits():
+    """Current use of each endpoint's concurrency limit and how many requests got a 429."""
+    return jsonify(limits_snapshot())
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Latency histograms and counters in the Prometheus text format (see backend/metrics.py)."""
+    if not METRICS_ENABLED:
+        return jsonify({"error": "Metrics are disabled (METRICS_ENABLED=0)"}), 404
+    return Response(render(), mimetype='text/plain; version=0.0.4')
+
 @app.route('/upload-files', methods=['POST'])
+@limited(upload_limit)
 def handle_upload():
     """
     Receives files and a bucket name from the frontend and uploads them to S3.
+
+    Optional form fields:
+      mode=sync      only upload files that are new or changed in the bucket
+      delete=true    with mode=sync, delete objects that were not sent
+      optimize=true  publish through the asset pipeline (backend/assets.py):
+                     precompressed text, content-hashed copies of assets
+                     referenced from HTML/CSS, and Cache-Control headers
     """
     if 'files' not in request.files:
         return jsonify({"error": "No files part in the request"}), 400
@@ -83,50 +244,87 @@ def handle_upload():
     if not files or files[0].filename == '':
         return jsonify({"error": "No selected files"}), 400
 
-    uploaded_count = 0
-    errors = []
-
-    for file in files:
-        if file and file.filename: # Check if file object and filename exist
-            try:
-                # Basic Content-Type detection based on extension
-                content_type = 'application/octet-stream' # Default
-                if file.filename.endswith('.html'):
-                    content_type = 'text/html'
-                elif file.filename.endswith('.css'):
-                    content_type = 'text/css'
-                elif file.filename.endswith('.js'):
-                    content_type = 'application/javascript'
-                elif file.filename.endswith(('.png', '.jpg', '.jpeg', '.gif')):
-                    # Add more image types if needed
-                    content_type = f'image/{file.filename.split(".")[-1]}'
-
-                # Upload the file object directly to S3
-                s3_client.upload_fileobj(
-                    file,                   # The file object stream from Flask request
-                    bucket_name,            # Target S3 bucket name
-                    file.filename,          # Use the original filename as the S3 object key
-                    ExtraArgs={
-                        # 'ACL': 'public-read', # Make files publicly readable for website hosting
-                        'ContentType': content_type
-                        }
-                )
-                uploaded_count += 1
-            except Exception as e:
-                print(f"Error uploading {file.filename}: {e}")
-                errors.append(f"Failed to upload {file.filename}: {str(e)}")
+    sync = request.form.get('mode') == 'sync'
+    delete = request.form.get('delete', '').lower() in ('1', 'true', 'yes')
+    optimize = request.form.get('optimize', '').lower() in ('1', 'true', 'yes')
+
+    # Use the original filename as the S3 object key
+    items = [(file.filename, file.stream) for file in files if file and file.filename]
+    if optimize:
+        items, renamed = prepare_site(items)
+    if sync:
+        try:
+            report = sync_files(s3_client, bucket_name, items, delete=delete)
+        except Exception as e:
+            print(f"Error listing bucket {bucket_name}: {e}")
+            return jsonify({"error": f"Failed to read bucket '{bucket_name}' for sync: {str(e)}"}), 500
+    else:
+        # Upload the file streams from the Flask request in parallel
+        report = upload_files(s3_client, bucket_name, items)
+    uploaded_count = report["uploaded"]
+    errors = report["errors"]
+    print(f"Uploaded {uploaded_count} files to {bucket_name}: {report['stats']}")
+
+    body = {"files": report["files"], "stats": report["stats"]}
+    if optimize:
+        body["assets"] = asset_report(items, renamed)
+    if sync:
+        body["sync"] = report["sync"]
+        summary = (f"{report['sync']['skipped']} unchanged, "
+                   f"{report['sync']['deleted']} deleted")
 
     if errors:
-        return jsonify({
-            "message": f"Completed with errors. Uploaded {uploaded_count} files.",
-            "errors": errors
-        }), 500
+        body["message"] = f"Completed with errors. Uploaded {uploaded_count} files."
+        body["errors"] = errors
+        return jsonify(body), 500
     else:
-        return jsonify({"message": f"Successfully uploaded {uploaded_count} files to {bucket_name}."}), 200
+        body["message"] = f"Successfully uploaded {uploaded_count} files to {bucket_name}."
+        if sync:
+            body["message"] += f" ({summary})"
+        return jsonify(body), 200
+
+@app.route('/upload-stream', methods=['POST'])
+@limited(stream_upload_limit)
+def handle_upload_stream():
+    """
+    Streaming version of /upload-files for large files and whole-site archives.
+    The multipart body is parsed as it arrives and each file is piped straight
+    into S3, so memory use stays constant whatever the upload size. A .zip or
+    .tar.gz file is expanded into the bucket, keeping its relative paths.
+    The bucket name can be passed as ?bucketName= or as a form field sent
+    before the files.
+    """
+    boundary = request.mimetype_params.get('boundary')
+    if request.mimetype != 'multipart/form-data' or not boundary:
+        return jsonify({"error": "Expected a multipart/form-data request"}), 400
+
+    try:
+        report, bucket_name = ingest_multipart(
+            s3_client, request.stream, boundary.encode('latin-1'), request.args.get('bucketName')
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        print(f"Error streaming upload: {e}")
+        return jsonify({"error": f"Failed to stream upload: {str(e)}"}), 500
+
+    if not report["files"]:
+        return jsonify({"error": "No selected files"}), 400
+    uploaded_count = report["uploaded"]
+    print(f"Streamed {uploaded_count} files to {bucket_name}: {report['stats']}")
+
+    body = {"files": report["files"], "stats": report["stats"]}
+    if report["errors"]:
+        body["message"] = f"Completed with errors. Uploaded {uploaded_count} files."
+        body["errors"] = report["errors"]
+        return jsonify(body), 500
+    body["message"] = f"Successfully uploaded {uploaded_count} files to {bucket_name}."
+    return jsonify(body), 200
 
 if __name__ == '__main__':
     # Run the Flask app on port 5001 in debug mode
     # debug=True allows automatic reloading when you save changes
+    # For many concurrent users run `python -m backend.serve` instead
     app.run(debug=True, port=5001)
     
     
@@ -0,0 +1,344 @@
+# backend/assets.py
+# Asset publishing pipeline used by /upload-files when optimize=true.
+# Before a site is uploaded:
+#   - CSS, JS, images and fonts referenced from HTML or CSS get a copy under
+#     a content-hashed name (style.css -> style.3f2a9c1b0d.css) and the
+#     references are rewritten to point at it. The original key is uploaded
+#     too, so references we can't see (from JavaScript, old bookmarks) keep
+#     working.
+#   - Text assets above a size threshold are stored precompressed with the
+#     matching Content-Encoding. S3 can't negotiate encodings, so every
+#     client gets the compressed body; gzip is the safe default.
+#   - Hashed names get a far-future Cache-Control, HTML a short one.
+# Compression of large files runs in a process pool while the other files
+# are already uploading.
+import gzip
+import hashlib
+import io
+import multiprocessing
+import os
+import posixpath
+import re
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from urllib.parse import unquote
+
+from backend.uploads import guess_content_type
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# --- Tuning (override with environment variables) ---
+# 'gzip' or 'br'. Browsers only accept brotli over HTTPS, so 'br' is only
+# safe behind CloudFront, never on the plain-HTTP S3 website endpoint.
+ASSET_ENCODING = os.environ.get('ASSET_ENCODING', 'gzip')
+# Smaller files are not worth compressing
+ASSET_COMPRESS_MIN_BYTES = int(os.environ.get('ASSET_COMPRESS_MIN_BYTES', '1024'))
+# Files at least this big are compressed in the process pool; smaller ones
+# are compressed inline, which is cheaper than shipping them to a process
+ASSET_POOL_MIN_BYTES = int(os.environ.get('ASSET_POOL_MIN_BYTES', str(64 * 1024)))
+ASSET_COMPRESS_WORKERS = int(os.environ.get('ASSET_COMPRESS_WORKERS', str(min(4, os.cpu_count() or 1))))
+
+HASHED_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+HTML_CACHE_CONTROL = os.environ.get('ASSET_HTML_CACHE_CONTROL', 'public, max-age=60')
+DEFAULT_CACHE_CONTROL = os.environ.get('ASSET_DEFAULT_CACHE_CONTROL', 'public, max-age=300')
+
+FINGERPRINT_EXTENSIONS = {
+    '.css', '.js', '.mjs', '.png', '.jpg', '.jpeg', '.gif', '.svg', '.webp', '.avif', '.ico',
+    '.woff', '.woff2', '.ttf', '.otf', '.eot', '.mp4', '.webm', '.mp3', '.json', '.wasm',
+}
+COMPRESSIBLE_TYPES = {
+    'application/javascript', 'application/json', 'application/manifest+json', 'application/xml',
+    'application/wasm', 'image/svg+xml', 'image/x-icon', 'font/ttf', 'font/otf', 'application/vnd.ms-fontobject',
+}
+HASH_LENGTH = 10
+
+# --- References in HTML and CSS ---
+HTML_ATTRIBUTE = re.compile(r"""(\b(?:src|href|poster|data-src)\s*=\s*)(["'])([^"']+)\2""", re.IGNORECASE)
+HTML_SRCSET = re.compile(r"""(\bsrcset\s*=\s*)(["'])([^"']+)\2""", re.IGNORECASE)
+CSS_URL = re.compile(r"""(url\(\s*)(["']?)([^"')]+)\2(\s*\))""", re.IGNORECASE)
+CSS_IMPORT = re.compile(r"""(@import\s+)(["'])([^"']+)\2""", re.IGNORECASE)
+EXTERNAL = re.compile(r"^(?:[a-z][a-z0-9+.-]*:|//|#)", re.IGNORECASE)
+
+def is_html(key):
+    return key.lower().endswith(('.html', '.htm'))
+
+def is_css(key):
+    return key.lower().endswith('.css')
+
+def resolve_reference(referrer, url):
+    """Returns the bucket key a relative or root-relative URL points at, or None."""
+    url = url.strip()
+    if not url or EXTERNAL.match(url):
+        return None
+    path = re.split(r"[?#]", url, maxsplit=1)[0]
+    if not path:
+        return None
+    path = unquote(path)
+    if path.startswith('/'):
+        key = posixpath.normpath(path.lstrip('/'))
+    else:
+        key = posixpath.normpath(posixpath.join(posixpath.dirname(referrer), path))
+    if key.startswith('..'):
+        return None
+    return key
+
+def hashed_name(name, digest):
+    """Inserts the hash before the extension: 'img/a.png' -> 'img/a.<hash>.png'."""
+    stem, extension = posixpath.splitext(name)
+    return f"{stem}.{digest}{extension}"
+
+def _rewrite_url(referrer, url, renamed):
+    key = resolve_reference(referrer, url)
+    if key not in renamed:
+        return url
+    # Keep the reference's own form (relative, encoded, query) and only swap the file name
+    cut = len(url)
+    for marker in '?#':
+        index = url.find(marker)
+        if index != -1:
+            cut = min(cut, index)
+    path, suffix = url[:cut], url[cut:]
+    head, slash, name = path.rpartition('/')
+    digest = posixpath.splitext(posixpath.splitext(renamed[key])[0])[1][1:]
+    return head + slash + hashed_name(name, digest) + suffix
+
+def _references(key, text):
+    """Every URL referenced from an HTML or CSS file."""
+    urls = []
+    patterns = [CSS_URL, CSS_IMPORT] + ([HTML_ATTRIBUTE] if is_html(key) else [])
+    for pattern in patterns:
+        urls.extend(match.group(3) for match in pattern.finditer(text))
+    if is_html(key):
+        for match in HTML_SRCSET.finditer(text):
+            urls.extend(candidate.split()[0] for candidate in match.group(3).split(',') if candidate.strip())
+    return urls
+
+def rewrite_references(key, text, renamed):
+    """Points every reference in an HTML or CSS file at the renamed keys."""
+    def replace(match):
+        return match.group(1) + match.group(2) + _rewrite_url(key, match.group(3), renamed) + match.group(2) + (
+            match.group(4) if match.re is CSS_URL else '')
+
+    def replace_srcset(match):
+        candidates = []
+        for candidate in match.group(3).split(','):
+            parts = candidate.strip().split(None, 1)
+            if parts:
+                parts[0] = _rewrite_url(key, parts[0], renamed)
+            candidates.append(' '.join(parts))
+        return match.group(1) + match.group(2) + ', '.join(candidates) + match.group(2)
+
+    text = CSS_URL.sub(replace, text)
+    text = CSS_IMPORT.sub(replace, text)
+    if is_html(key):
+        text = HTML_ATTRIBUTE.sub(replace, text)
+        text = HTML_SRCSET.sub(replace_srcset, text)
+    return text
+
+def _decode(data):
+    try:
+        return data.decode('utf-8')
+    except UnicodeDecodeError:
+        return None
+
+def fingerprint_site(contents):
+    """
+    Takes {key: bytes}. Returns ({key: bytes} with rewritten HTML/CSS,
+    {original key: hashed key} for every fingerprinted asset).
+    """
+    texts = {key: _decode(data) for key, data in contents.items() if is_html(key) or is_css(key)}
+    texts = {key: text for key, text in texts.items() if text is not None}
+    referenced = set()
+    for key, text in texts.items():
+        referenced.update(resolve_reference(key, url) for url in _references(key, text))
+    referenced = {
+        key for key in referenced
+        if key in contents and posixpath.splitext(key)[1].lower() in FINGERPRINT_EXTENSIONS
+    }
+
+    output = dict(contents)
+    renamed = {}
+    visiting = set()
+
+    def finalize(key):
+        # CSS is hashed after its own references are rewritten, so a changed
+        # image also changes the name of every stylesheet that uses it
+        if key in renamed or key in visiting:
+            return
+        visiting.add(key)
+        if key in texts:
+            for url in _references(key, texts[key]):
+                target = resolve_reference(key, url)
+                if target in referenced and target != key:
+                    finalize(target)
+            output[key] = rewrite_references(key, texts[key], renamed).encode('utf-8')
+        visiting.discard(key)
+        if key in referenced:
+            digest = hashlib.sha256(output[key]).hexdigest()[:HASH_LENGTH]
+            renamed[key] = hashed_name(key, digest)
+
+    for key in sorted(referenced):
+        finalize(key)
+    for key in texts:
+        if key not in renamed:
+            output[key] = rewrite_references(key, texts[key], renamed).encode('utf-8')
+    return output, renamed
+
+# --- Compression ---
+
+def compress(data, encoding):
+    """Runs in the process pool. gzip output is deterministic (mtime=0) so sync mode can skip it."""
+    if encoding == 'br':
+        return brotli.compress(data, quality=11)
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+def is_compressible(key, size):
+    content_type = guess_content_type(key)
+    return size >= ASSET_COMPRESS_MIN_BYTES and (content_type.startswith('text/') or content_type in COMPRESSIBLE_TYPES)
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def compression_pool():
+    """One process pool for the whole server, created on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # 'spawn' everywhere: forking a multi-threaded server is unsafe
+            _pool = ProcessPoolExecutor(
+                max_workers=ASSET_COMPRESS_WORKERS, mp_context=multiprocessing.get_context('spawn')
+            )
+        return _pool
+
+def _discard_pool(pool):
+    """Drops a broken pool so the next request starts a fresh one."""
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+def submit_compression(data, encoding):
+    pool = compression_pool()
+    try:
+        return pool.submit(compress, data, encoding)
+    except (BrokenProcessPool, RuntimeError) as e:
+        print(f"Compression pool unavailable, compressing inline: {e}")
+        _discard_pool(pool)
+        return _Done(compress(data, encoding))
+
+class CompressedBody:
+    """
+    A file object for a body that is still being compressed. Reading it
+    waits for the result, so the other files keep uploading in the meantime.
+    """
+
+    def __init__(self, future, data, encoding):
+        self._future = future
+        self._data = data
+        self._encoding = encoding
+        self._body = None
+        self._size = None
+        self.original_size = len(data)
+
+    def _resolve(self):
+        if self._body is None:
+            try:
+                compressed = self._future.result()
+            except BrokenProcessPool as e:
+                print(f"Compression pool failed, compressing inline: {e}")
+                compressed = compress(self._data, self._encoding)
+            self._body = io.BytesIO(compressed)
+            self._size = len(compressed)
+            self._data = None
+        return self._body
+
+    @property
+    def size(self):
+        if self._size is None:
+            self._resolve()
+        return self._size
+
+    def read(self, size=-1):
+        return self._resolve().read(size)
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        return self._resolve().seek(offset, whence)
+
+    def tell(self):
+        return self._resolve().tell()
+
+    def close(self):
+        # boto3 closes the file object once the upload is done
+        if self._body is not None:
+            self._body.close()
+        self._data = None
+
+class _Done:
+    """Stands in for a future when compression ran inline."""
+
+    def __init__(self, value):
+        self._value = value
+
+    def result(self):
+        return self._value
+
+def _encoding():
+    if ASSET_ENCODING == 'br' and brotli is None:
+        print("ASSET_ENCODING=br but the brotli package is not installed; using gzip.")
+        return 'gzip'
+    return 'br' if ASSET_ENCODING == 'br' else 'gzip'
+
+# --- Pipeline ---
+
+def prepare_site(files):
+    """
+    Turns (key, file object) pairs into upload items (key, file object,
+    metadata, headers) with fingerprinted copies, rewritten references, precompressed
+    bodies and cache headers. Returns (items, {original key: hashed key}).
+    """
+    contents = {key: fileobj.read() for key, fileobj in files}
+    contents, renamed = fingerprint_site(contents)
+    encoding = _encoding()
+
+    plain, compressed = [], []
+    # A fingerprinted asset is published under both names; compress it once
+    futures = {}
+    publish = [(key, key, DEFAULT_CACHE_CONTROL) for key in contents]
+    publish += [(hashed, key, HASHED_CACHE_CONTROL) for key, hashed in renamed.items()]
+    for key, source, cache_control in publish:
+        if is_html(key):
+            cache_control = HTML_CACHE_CONTROL
+        data = contents[source]
+        headers = {'ContentType': guess_content_type(source), 'CacheControl': cache_control}
+        if not is_compressible(source, len(data)):
+            plain.append((key, io.BytesIO(data), None, headers))
+            continue
+        future = futures.get(source)
+        if future is None:
+            if len(data) >= ASSET_POOL_MIN_BYTES:
+                future = submit_compression(data, encoding)
+            else:
+                future = _Done(compress(data, encoding))
+            futures[source] = future
+        headers['ContentEncoding'] = encoding
+        compressed.append((key, CompressedBody(future, data, encoding), None, headers))
+
+    # Files that need no compression go first so they upload while the pool works
+    return plain + compressed, renamed
+
+def asset_report(items, renamed):
+    """Summary of what the pipeline did, for the upload response."""
+    bodies = [item[1] for item in items if isinstance(item[1], CompressedBody)]
+    encodings = {item[3]['ContentEncoding'] for item in items if 'ContentEncoding' in item[3]}
+    return {
+        "fingerprinted": len(renamed),
+        "compressed": len(bodies),
+        "encoding": encodings.pop() if encodings else None,
+        "bytesBeforeCompression": sum(body.original_size for body in bodies),
+        "bytesAfterCompression": sum(body.size for body in bodies),
+    }
@@ -0,0 +1,375 @@
+# backend/ingest.py
+# Constant-memory streaming ingest used by the /upload-stream endpoint.
+# The multipart request body is parsed incrementally and every file part is
+# piped straight into S3 with fixed-size buffers, so nothing is spooled to
+# memory or temp disk. A .zip or .tar.gz part is expanded entry by entry.
+import os
+import posixpath
+import struct
+import tarfile
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.sansio.multipart import Epilogue, Field, File, MultipartDecoder, NeedData
+
+from backend.metrics import observe_upload
+from backend.uploads import MULTIPART_CHUNKSIZE, guess_content_type, summarize
+
+# Bytes read from the request body per step
+INGEST_READ_SIZE = 64 * 1024
+# Upper bound on part buffers held at once (memory cap = this * part size)
+INGEST_MAX_BUFFERS = int(os.environ.get('INGEST_MAX_BUFFERS', '8'))
+# Plain form fields (bucketName, prefix...) are small; refuse anything bigger
+MAX_FIELD_SIZE = 64 * 1024
+
+ARCHIVE_SUFFIXES = ('.zip', '.tar.gz', '.tgz')
+
+# --- Incremental multipart parsing ---
+
+class MultipartReader:
+    """
+    Pull-style wrapper around Werkzeug's incremental MultipartDecoder.
+    parts() yields (name, filename, reader) for each part in order; filename
+    is None for plain fields. Each reader must be consumed before the next
+    part is requested (anything left over is skipped automatically).
+    """
+
+    def __init__(self, stream, boundary, read_size=INGEST_READ_SIZE):
+        self._stream = stream
+        self._decoder = MultipartDecoder(boundary)
+        self._read_size = read_size
+
+    def next_event(self):
+        while True:
+            event = self._decoder.next_event()
+            if not isinstance(event, NeedData):
+                return event
+            if self._decoder.complete:
+                raise ValueError("Unexpected end of multipart body")
+            data = self._stream.read(self._read_size)
+            self._decoder.receive_data(data if data else None)
+
+    def parts(self):
+        current = None
+        while True:
+            if current is not None:
+                current.drain()
+            event = self.next_event()
+            if isinstance(event, (Field, File)):
+                current = _PartReader(self)
+                yield event.name, getattr(event, 'filename', None), current
+            elif isinstance(event, Epilogue):
+                return
+
+class _PartReader:
+    """File-like reader over the body of one multipart part."""
+
+    def __init__(self, multipart):
+        self._multipart = multipart
+        self._buffer = bytearray()
+        self._done = False
+
+    def read(self, size=-1):
+        while not self._done and (size is None or size < 0 or len(self._buffer) < size):
+            event = self._multipart.next_event()
+            self._buffer += event.data
+            if not event.more_data:
+                self._done = True
+        if size is None or size < 0:
+            size = len(self._buffer)
+        data = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        return data
+
+    def drain(self):
+        while self.read(INGEST_READ_SIZE):
+            pass
+
+# --- Streaming archive readers ---
+
+def safe_key(name, prefix=''):
+    """Turns an archive member path into an S3 key, or None if it is unsafe."""
+    name = name.replace('\\', '/')
+    key = posixpath.normpath(name.lstrip('/'))
+    if key in ('.', '') or key == '..' or key.startswith('../'):
+        return None
+    return f"{prefix}{key}"
+
+def iter_tar_entries(reader):
+    """Yields (name, file object) for every regular file in a streamed .tar.gz."""
+    # 'r|gz' reads the archive strictly forward, one member at a time
+    with tarfile.open(fileobj=reader, mode='r|gz') as archive:
+        for member in archive:
+            if member.isfile():
+                yield member.name, archive.extractfile(member)
+
+class _PushbackReader:
+    """Reader that lets bytes read too far be returned to the stream."""
+
+    def __init__(self, reader):
+        self._reader = reader
+        self._pending = b''
+
+    def unread(self, data):
+        self._pending = data + self._pending
+
+    def read(self, size):
+        if self._pending:
+            data, self._pending = self._pending[:size], self._pending[size:]
+            return data
+        return self._reader.read(size)
+
+    def read_exactly(self, size):
+        chunks = []
+        while size > 0:
+            data = self.read(size)
+            if not data:
+                raise ValueError("Unexpected end of zip archive")
+            chunks.append(data)
+            size -= len(data)
+        return b''.join(chunks)
+
+class _ZipEntryReader:
+    """Reads one (stored or deflated) zip entry without knowing its size up front."""
+
+    def __init__(self, source, method, compressed_size):
+        self._source = source
+        self._remaining = compressed_size
+        self._inflater = zlib.decompressobj(-15) if method == 8 else None
+        self._done = False
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            size = INGEST_READ_SIZE
+        while not self._done:
+            if self._inflater is None:
+                # Stored entry: the size is always known here
+                if self._remaining == 0:
+                    self._done = True
+                    break
+                data = self._source.read(min(size, self._remaining))
+                if not data:
+                    raise ValueError("Unexpected end of zip archive")
+                self._remaining -= len(data)
+                return data
+            if self._inflater.unconsumed_tail:
+                compressed = self._inflater.unconsumed_tail
+            else:
+                want = INGEST_READ_SIZE if self._remaining is None else min(INGEST_READ_SIZE, self._remaining)
+                compressed = self._source.read(want) if want else b''
+                if not compressed and not self._inflater.eof:
+                    raise ValueError("Unexpected end of zip archive")
+                if self._remaining is not None:
+                    self._remaining -= len(compressed)
+            data = self._inflater.decompress(compressed, size)
+            if self._inflater.eof:
+                # The deflate stream knows where it ends; give back what we over-read
+                self._source.unread(self._inflater.unused_data)
+                self._done = True
+            if data:
+                return data
+        return b''
+
+    def drain(self):
+        while self.read(INGEST_READ_SIZE):
+            pass
+
+ZIP_LOCAL_HEADER = struct.Struct('<HHHHHIIIHH')
+ZIP_LOCAL_SIG = b'PK\x03\x04'
+ZIP_END_SIGS = (b'PK\x01\x02', b'PK\x05\x06', b'PK\x06\x06', b'')
+ZIP_DESCRIPTOR_SIG = b'PK\x07\x08'
+
+def iter_zip_entries(reader):
+    """
+    Yields (name, file object) for every file in a streamed .zip by walking
+    the local file headers front to back, so the central directory at the
+    end of the archive is never needed.
+    """
+    source = _PushbackReader(reader)
+    while True:
+        signature = _read_exactly(source, 4)
+        if signature in ZIP_END_SIGS:
+            return
+        if signature != ZIP_LOCAL_SIG:
+            raise ValueError("Not a zip archive or unsupported layout")
+        (_, flags, method, _, _, _, compressed_size, _,
+         name_length, extra_length) = ZIP_LOCAL_HEADER.unpack(source.read_exactly(ZIP_LOCAL_HEADER.size))
+        raw_name = source.read_exactly(name_length)
+        extra = source.read_exactly(extra_length)
+        name = raw_name.decode('utf-8' if flags & 0x800 else 'cp437')
+
+        zip64 = False
+        offset = 0
+        while offset + 4 <= len(extra):
+            header_id, size = struct.unpack_from('<HH', extra, offset)
+            if header_id == 0x0001:
+                zip64 = True
+                if compressed_size == 0xFFFFFFFF and size >= 16:
+                    compressed_size = struct.unpack_from('<Q', extra, offset + 12)[0]
+            offset += 4 + size
+
+        if flags & 0x1:
+            raise ValueError(f"Encrypted zip entry '{name}' is not supported")
+        if method not in (0, 8):
+            raise ValueError(f"Zip entry '{name}' uses unsupported compression method {method}")
+        has_descriptor = bool(flags & 0x8)
+        if has_descriptor and method == 0:
+            raise ValueError(f"Stored zip entry '{name}' without a known size cannot be streamed")
+
+        entry = _ZipEntryReader(source, method, None if has_descriptor else compressed_size)
+        if not name.endswith('/'):
+            yield name, entry
+        entry.drain()
+
+        if has_descriptor:
+            # Optional signature, then CRC-32 and the two sizes
+            first = source.read_exactly(4)
+            rest = (16 if zip64 else 8) if first != ZIP_DESCRIPTOR_SIG else (20 if zip64 else 12)
+            source.read_exactly(rest)
+
+def iter_archive_entries(filename, reader):
+    if filename.lower().endswith('.zip'):
+        return iter_zip_entries(reader)
+    return iter_tar_entries(reader)
+
+# --- Streaming S3 writer ---
+
+def _read_exactly(reader, size):
+    """Reads up to `size` bytes, stopping early only at end of stream."""
+    buffer = bytearray()
+    while len(buffer) < size:
+        data = reader.read(size - len(buffer))
+        if not data:
+            break
+        buffer += data
+    return bytes(buffer)
+
+class StreamingUploader:
+    """
+    Pipes readers into S3 using at most `max_buffers` part-sized buffers.
+    Small objects become a single put_object that runs in the background;
+    larger ones become multipart uploads whose parts are sent while the
+    next part is being read from the request.
+    """
+
+    def __init__(self, s3_client, bucket_name, part_size=MULTIPART_CHUNKSIZE, max_buffers=INGEST_MAX_BUFFERS):
+        self._s3 = s3_client
+        self._bucket = bucket_name
+        self._part_size = part_size
+        self._pool = ThreadPoolExecutor(max_workers=max_buffers, thread_name_prefix='s3-ingest')
+        self._slots = threading.BoundedSemaphore(max_buffers)
+        self._pending = []
+
+    def _submit(self, fn, *args, **kwargs):
+        # Blocks the reader when every buffer is in flight (backpressure)
+        self._slots.acquire()
+        future = self._pool.submit(fn, *args, **kwargs)
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def _put(self, key, body, started_at):
+        try:
+            self._s3.put_object(Bucket=self._bucket, Key=key, Body=body, ContentType=guess_content_type(key))
+            status, error = 'uploaded', None
+        except Exception as e:
+            print(f"Error uploading {key}: {e}")
+            status, error = 'error', f"Failed to upload {key}: {str(e)}"
+        return _result(key, status, len(body), started_at, error)
+
+    def add(self, key, reader):
+        """Streams one object. Small objects finish in the background."""
+        started_at = time.perf_counter()
+        first = _read_exactly(reader, self._part_size)
+        if len(first) < self._part_size:
+            self._pending.append(self._submit(self._put, key, first, started_at))
+            return
+        self._pending.append(self._multipart(key, reader, first, started_at))
+
+    def _multipart(self, key, reader, first, started_at):
+        upload_id = None
+        total = 0
+        try:
+            upload_id = self._s3.create_multipart_upload(
+                Bucket=self._bucket, Key=key, ContentType=guess_content_type(key)
+            )['UploadId']
+            futures = []
+            part, number = first, 1
+            while part:
+                futures.append(self._submit(
+                    self._s3.upload_part, Bucket=self._bucket, Key=key,
+                    UploadId=upload_id, PartNumber=number, Body=part
+                ))
+                total += len(part)
+                part, number = _read_exactly(reader, self._part_size), number + 1
+            parts = [{'ETag': f.result()['ETag'], 'PartNumber': i} for i, f in enumerate(futures, 1)]
+            self._s3.complete_multipart_upload(
+                Bucket=self._bucket, Key=key, UploadId=upload_id, MultipartUpload={'Parts': parts}
+            )
+            return _result(key, 'uploaded', total, started_at)
+        except Exception as e:
+            print(f"Error uploading {key}: {e}")
+            if upload_id:
+                try:
+                    self._s3.abort_multipart_upload(Bucket=self._bucket, Key=key, UploadId=upload_id)
+                except Exception as abort_error:
+                    print(f"Error aborting multipart upload of {key}: {abort_error}")
+            return _result(key, 'error', total, started_at, f"Failed to upload {key}: {str(e)}")
+
+    def results(self):
+        """Waits for background uploads and returns every per-file result."""
+        results = [item.result() if hasattr(item, 'result') else item for item in self._pending]
+        self._pool.shutdown()
+        return results
+
+def _result(key, status, size, started_at, error=None):
+    result = {"key": key, "status": status, "bytes": size,
+              "seconds": round(time.perf_counter() - started_at, 4)}
+    if error:
+        result["error"] = error
+    observe_upload('upload_stream', result)
+    return result
+
+def ingest_multipart(s3_client, stream, boundary, bucket_name=None):
+    """
+    Streams every file part of a multipart body into S3.
+    Form fields are read as they appear, so `bucketName` (and the optional
+    `prefix` and `extract`) must be sent before the files unless given
+    up front. Archives are expanded unless extract=false.
+    Returns the same report as uploads.upload_files.
+    """
+    started_at = time.perf_counter()
+    fields = {}
+    uploader = None
+    try:
+        for name, filename, part in MultipartReader(stream, boundary).parts():
+            if filename is None:
+                value = part.read(MAX_FIELD_SIZE + 1)
+                if len(value) > MAX_FIELD_SIZE:
+                    raise ValueError(f"Form field '{name}' is too large")
+                fields[name] = value.decode('utf-8')
+                continue
+            if not filename:
+                continue
+            bucket_name = bucket_name or fields.get('bucketName')
+            if not bucket_name:
+                raise ValueError("Bucket name is required before the first file")
+            if uploader is None:
+                uploader = StreamingUploader(s3_client, bucket_name)
+            prefix = fields.get('prefix', '')
+            extract = fields.get('extract', 'true').lower() not in ('0', 'false', 'no')
+
+            if extract and filename.lower().endswith(ARCHIVE_SUFFIXES):
+                for entry_name, entry in iter_archive_entries(filename, part):
+                    key = safe_key(entry_name, prefix)
+                    if key is None:
+                        print(f"Skipping unsafe archive entry: {entry_name}")
+                        continue
+                    uploader.add(key, entry)
+            else:
+                uploader.add(f"{prefix}{filename}", part)
+    finally:
+        results = uploader.results() if uploader else []
+
+    return summarize(results, time.perf_counter() - started_at), bucket_name
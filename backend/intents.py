@@ -0,0 +1,145 @@
+# backend/intents.py
+# Deterministic fast path for /invoke-agent.
+# Fully specified deploy commands ("deploy a static website in bucket
+# acme-preview-42 in us-east-1") are matched against a small set of compiled
+# patterns and run directly with the same tool functions the agent's action
+# group uses, skipping the Bedrock round trip. Anything that does not match
+# exactly falls through to the agent.
+import os
+import re
+import threading
+import time
+
+from backend import lambda_function
+from backend.metrics import observe_request
+
+# Set INTENT_FAST_PATH=0 to send every prompt to the agent
+FAST_PATH_ENABLED = os.environ.get('INTENT_FAST_PATH', '1') not in ('0', 'false', 'no')
+
+# --- Grammar ---
+# S3 bucket names: 3-63 chars of lowercase letters, digits, dots and hyphens,
+# starting and ending with a letter or digit (the rest is checked below).
+BUCKET = r"['\"`]?(?P<bucket>[a-z0-9][a-z0-9.-]{1,61}[a-z0-9])['\"`]?"
+# Names in a list are separated by commas or a standalone "and" ("a, b and c",
+# "a, b, and c"); an "and" inside a name (my-and-site) is part of the name.
+SEPARATOR = r"\s*,\s*(?:and\s+)?|\s+and\s+"
+BUCKETS = r"(?P<buckets>[a-z0-9][a-z0-9.-]{1,61}[a-z0-9](?:(?:" + SEPARATOR + r")[a-z0-9][a-z0-9.-]{1,61}[a-z0-9])+)"
+REGION = r"(?:\s+in\s+(?:the\s+)?(?:region\s+)?(?P<region>[a-z]{2}(?:-gov)?-[a-z]+-\d)(?:\s+region)?)?"
+FUNCTION = r"['\"`]?(?P<function>[A-Za-z0-9_-]{1,64})['\"`]?"
+ROLE_ARN = r"(?P<role>arn:aws[a-z-]*:iam::\d{12}:role/[\w+=,.@/-]{1,512})"
+LEAD = r"^\s*(?:please\s+)?(?:can\s+you\s+)?"
+END = r"\s*[.!]?\s*$"
+NAMED = r"(?:named|called|with\s+(?:the\s+)?name|in\s+(?:the\s+|a\s+)?(?:s3\s+)?bucket(?:\s+named)?|using\s+(?:the\s+)?(?:s3\s+)?bucket)"
+
+def _compile(pattern):
+    return re.compile(LEAD + pattern + END, re.IGNORECASE)
+
+# (tool name, compiled pattern); the first match wins
+INTENTS = [
+    ('deploy_static_sites', _compile(
+        r"(?:deploy|create|set\s*up|launch)\s+(?:new\s+)?static\s+(?:web\s*)?sites\s+(?:named|called|in\s+buckets)\s+"
+        + BUCKETS + REGION)),
+    ('deploy_static_site', _compile(
+        r"(?:deploy|create|set\s*up|launch|host)\s+(?:a\s+|an\s+)?(?:new\s+)?static\s+(?:web\s*)?site\s+"
+        + NAMED + r"\s+" + BUCKET + REGION)),
+    ('create_s3_bucket', _compile(
+        r"create\s+(?:a\s+|an\s+)?(?:new\s+)?(?:s3\s+)?bucket\s+(?:named\s+|called\s+)?" + BUCKET + REGION)),
+    ('create_hello_world_lambda', _compile(
+        r"create\s+(?:a\s+)?(?:new\s+)?(?:simple\s+)?(?:['\"]?hello\s*world['\"]?\s+)?lambda(?:\s+function)?\s+"
+        r"(?:named|called)\s+" + FUNCTION + r"\s+(?:with|using)\s+(?:the\s+)?(?:execution\s+)?role(?:\s+arn)?\s+" + ROLE_ARN)),
+]
+
+def valid_bucket_name(name):
+    """The S3 naming rules the pattern alone cannot express."""
+    return (3 <= len(name) <= 63 and re.fullmatch(r"[a-z0-9][a-z0-9.-]*[a-z0-9]", name) is not None and '..' not in name and '.-' not in name and '-.' not in name
+            and not re.fullmatch(r"\d+\.\d+\.\d+\.\d+", name))
+
+def match_intent(prompt):
+    """Returns (tool name, arguments) for a fully specified command, or None."""
+    if not FAST_PATH_ENABLED or not prompt:
+        return None
+    for tool, pattern in INTENTS:
+        match = pattern.match(prompt)
+        if not match:
+            continue
+        groups = match.groupdict()
+        region = (groups.get('region') or 'us-east-1').lower()
+        if tool == 'deploy_static_sites':
+            names = [n for n in re.split(SEPARATOR, groups['buckets'], flags=re.IGNORECASE) if n]
+            if not all(valid_bucket_name(n) for n in names):
+                return None
+            return tool, {'bucket_names': names, 'region': region}
+        if tool in ('deploy_static_site', 'create_s3_bucket'):
+            bucket = groups['bucket']
+            if not valid_bucket_name(bucket):
+                return None
+            return tool, {'bucket_name': bucket, 'region': region}
+        if tool == 'create_hello_world_lambda':
+            return tool, {'function_name': groups['function'], 'role_arn': groups['role']}
+    return None
+
+# Tool errors meaning the backend's own credentials may not run the tool.
+# The action group Lambda has its own role, so the agent can still do it.
+AUTHORIZATION_ERRORS = (
+    'AccessDenied', 'UnauthorizedOperation', 'is not authorized to perform', 'InvalidClientTokenId',
+    'UnrecognizedClientException', 'ExpiredToken', 'Unable to locate credentials',
+)
+
+def run_intent(tool, args):
+    """
+    Runs a matched command with the action group's own tool functions.
+    Returns None if the backend's credentials are not allowed to, so the
+    caller can hand the prompt to the agent instead.
+    """
+    kwargs, error = lambda_function.validate_arguments(tool, lambda_function.TOOLS[tool], args)
+    if error:
+        return error
+    if lambda_function.TOOLS[tool].get('needs_deadline'):
+        kwargs['deadline'] = lambda_function.fleet_deadline(None)
+    result = lambda_function.run_tool(tool, kwargs)
+    if any(error in result for error in AUTHORIZATION_ERRORS):
+        print(f"Fast path not authorized to run {tool}; sending the prompt to the agent.")
+        return None
+    return result
+
+# --- Metrics ---
+
+class RouterStats:
+    """Hit rate and latency for the fast path and the Bedrock agent path."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._paths = {path: {'count': 0, 'totalMs': 0.0, 'maxMs': 0.0} for path in ('fast_path', 'agent')}
+
+    def record(self, path, seconds):
+        ms = seconds * 1000
+        with self._lock:
+            stats = self._paths[path]
+            stats['count'] += 1
+            stats['totalMs'] += ms
+            stats['maxMs'] = max(stats['maxMs'], ms)
+
+    def snapshot(self):
+        with self._lock:
+            total = sum(p['count'] for p in self._paths.values())
+            return {
+                'enabled': FAST_PATH_ENABLED,
+                'requests': total,
+                'fastPathHitRate': round(self._paths['fast_path']['count'] / total, 4) if total else None,
+                'paths': {
+                    path: {
+                        'count': p['count'],
+                        'meanMs': round(p['totalMs'] / p['count'], 2) if p['count'] else None,
+                        'maxMs': round(p['maxMs'], 2),
+                    }
+                    for path, p in self._paths.items()
+                },
+            }
+
+router_stats = RouterStats()
+
+def timed(path, started_at):
+    """Records a finished request on the given path."""
+    seconds = time.perf_counter() - started_at
+    router_stats.record(path, seconds)
+    observe_request(path, seconds)
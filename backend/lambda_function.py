@@ -1,27 +1,133 @@
 # backend/lambda_function.py (NEW VERSION)
+import time
+_INIT_STARTED_AT = time.perf_counter()
+
+import hashlib
+import io
 import json
+import os
 import boto3
-import base64
+import threading
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, wait
+from botocore.config import Config
+
+# One botocore config shared by every client:
+# - keep-alive so warm invocations reuse their TLS connections
+# - a connection pool sized for the fleet worker threads
+# - adaptive retry mode, whose client-side rate limiter backs off when AWS
+#   returns throttling errors
+# - bounded timeouts so a hung call cannot eat the whole Lambda timeout
+FLEET_MAX_WORKERS = 8
+aws_config = Config(
+    tcp_keepalive=True,
+    max_pool_connections=FLEET_MAX_WORKERS * 2,
+    retries={'max_attempts': 8, 'mode': 'adaptive'},
+    connect_timeout=5,
+    read_timeout=60,
+)
+
+# Latency and retries of every AWS call are added to the invoke log line.
+# Set METRICS_ENABLED=0 to skip it; the clients then get no event handlers.
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '1').lower() not in ('0', 'false', 'no')
+
+class AwsCallStats:
+    """Per-operation latency, retries and errors of the AWS calls in one invocation."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def reset(self):
+        with self._lock:
+            self._calls = {}
+
+    def record(self, operation, seconds, retries, error):
+        ms = seconds * 1000
+        with self._lock:
+            stats = self._calls.get(operation)
+            if stats is None:
+                stats = self._calls[operation] = {'count': 0, 'totalMs': 0.0, 'maxMs': 0.0, 'retries': 0, 'errors': 0}
+            stats['count'] += 1
+            stats['totalMs'] += ms
+            stats['maxMs'] = max(stats['maxMs'], ms)
+            stats['retries'] += retries
+            stats['errors'] += 1 if error else 0
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                operation: dict(stats, totalMs=round(stats['totalMs'], 2), maxMs=round(stats['maxMs'], 2))
+                for operation, stats in self._calls.items()
+            }
+
+aws_calls = AwsCallStats()
 
-# Initialize clients
-s3_client = boto3.client('s3')
-lambda_client = boto3.client('lambda')
+def instrument_client(service, client):
+    """Times every API call of a client with botocore's before-call/after-call events."""
+    def started(model, context, **kwargs):
+        context['metrics_operation'] = f"{service}.{model.name}"
+        context['metrics_started_at'] = time.perf_counter()
 
-# --- Tool Functions (No changes to these) ---
+    def finished(parsed, context, **kwargs):
+        if 'metrics_started_at' in context:
+            aws_calls.record(
+                context['metrics_operation'], time.perf_counter() - context['metrics_started_at'],
+                parsed.get('ResponseMetadata', {}).get('RetryAttempts', 0), 'Error' in parsed,
+            )
+
+    def failed(context, **kwargs):
+        # Connection errors that survived every retry
+        if 'metrics_started_at' in context:
+            aws_calls.record(context['metrics_operation'], time.perf_counter() - context['metrics_started_at'], 0, True)
+
+    client.meta.events.register('before-call', started)
+    client.meta.events.register('after-call', finished)
+    client.meta.events.register('after-call-error', failed)
+    return client
+
+# Clients are created on first use rather than at import time, so a cold
+# start only pays for the clients the invoked tool actually needs. They are
+# kept at module level and reused by later (warm) invocations.
+_clients = {}
+_clients_lock = threading.Lock()
+
+def get_client(service):
+    """Returns the shared boto3 client for a service, creating it on first use."""
+    client = _clients.get(service)
+    if client is None:
+        # Creating clients from the default session is not thread-safe
+        with _clients_lock:
+            client = _clients.get(service)
+            if client is None:
+                client = boto3.client(service, config=aws_config)
+                if METRICS_ENABLED:
+                    instrument_client(service, client)
+                _clients[service] = client
+    return client
+
+def log_event(event, **fields):
+    """Writes one structured (JSON) log line to CloudWatch."""
+    print(json.dumps({'event': event, **fields}, default=str))
+
+# --- Tool Functions ---
 def create_s3_bucket(bucket_name, region="us-east-1"):
     try:
         if region == 'us-east-1':
-            s3_client.create_bucket(Bucket=bucket_name)
+            get_client('s3').create_bucket(Bucket=bucket_name)
         else:
             location_config = {'LocationConstraint': region}
-            s3_client.create_bucket(Bucket=bucket_name, CreateBucketConfiguration=location_config)
+            get_client('s3').create_bucket(Bucket=bucket_name, CreateBucketConfiguration=location_config)
         return f"Success: Bucket '{bucket_name}' created in region {region}."
+    except get_client('s3').exceptions.BucketAlreadyOwnedByYou:
+        # Safe to continue: the bucket exists and belongs to this account
+        return f"Success: Bucket '{bucket_name}' already exists and is owned by you."
     except Exception as e:
         return f"Error: Failed to create bucket '{bucket_name}'. Reason: {str(e)}"
 
 def disable_s3_block_public_access(bucket_name):
     try:
-        s3_client.delete_public_access_block(Bucket=bucket_name)
+        get_client('s3').delete_public_access_block(Bucket=bucket_name)
         return f"Success: Disabled Block Public Access for '{bucket_name}'."
     except Exception as e:
         return f"Error: Failed to disable Block Public Access. Reason: {str(e)}"
@@ -29,7 +135,7 @@ def disable_s3_block_public_access(bucket_name):
 def set_public_read_policy(bucket_name):
     try:
         policy = { "Version": "2012-10-17", "Statement": [{"Sid": "PublicReadGetObject", "Effect": "Allow", "Principal": "*", "Action": ["s3:GetObject"], "Resource": f"arn:aws:s3:::{bucket_name}/*"}]}
-        s3_client.put_bucket_policy(Bucket=bucket_name, Policy=json.dumps(policy))
+        get_client('s3').put_bucket_policy(Bucket=bucket_name, Policy=json.dumps(policy))
         return f"Success: Set public read policy on '{bucket_name}'."
     except Exception as e:
         return f"Error: Failed to set bucket policy. Reason: {str(e)}"
@@ -37,59 +143,524 @@ def set_public_read_policy(bucket_name):
 def configure_s3_static_hosting(bucket_name):
     try:
         website_configuration = {'IndexDocument': {'Suffix': 'index.html'}}
-        s3_client.put_bucket_website(Bucket=bucket_name, WebsiteConfiguration=website_configuration)
+        get_client('s3').put_bucket_website(Bucket=bucket_name, WebsiteConfiguration=website_configuration)
         return f"Success: Configured static hosting for '{bucket_name}'."
     except Exception as e:
         return f"Error: Failed to configure hosting. Reason: {str(e)}"
 
-import base64 # Make sure base64 is imported at the top
+# --- Composite Tools ---
+# Each step is safe to repeat, so re-running a failed deploy resumes it.
+STATIC_SITE_STEPS = [
+    'create_s3_bucket',
+    'disable_s3_block_public_access',
+    'set_public_read_policy',
+    'configure_s3_static_hosting',
+]
+# Bucket policy calls can briefly fail with AccessDenied right after Block
+# Public Access is removed, so that step gets a short retry instead of a
+# round trip back through the agent.
+RETRIED_STEPS = {'set_public_read_policy': 3}
+STEP_RETRY_DELAY = 1.0
+
+def deploy_static_site(bucket_name, region="us-east-1"):
+    """Runs the whole static website setup in one invocation."""
+    step_args = {'create_s3_bucket': {'bucket_name': bucket_name, 'region': region}}
+    report = []
+    started_at = time.perf_counter()
+    for number, step in enumerate(STATIC_SITE_STEPS, 1):
+        step_started_at = time.perf_counter()
+        attempts = RETRIED_STEPS.get(step, 1)
+        for attempt in range(1, attempts + 1):
+            result = run_tool(step, step_args.get(step, {'bucket_name': bucket_name}))
+            if result.startswith('Success') or attempt == attempts:
+                break
+            time.sleep(STEP_RETRY_DELAY * attempt)
+        seconds = time.perf_counter() - step_started_at
+        report.append(f"{number}. {step} ({seconds:.2f}s): {result}")
+        if not result.startswith('Success'):
+            message = f"Error: Static website deployment for '{bucket_name}' stopped at step {number} ({step}).\n" + "\n".join(report)
+            if number > 1:
+                message += f"\nEvery step is safe to repeat: call deploy_static_site again with bucket '{bucket_name}' to resume."
+            return message
+    total = time.perf_counter() - started_at
+    return (
+        f"Success: Static website bucket '{bucket_name}' created and configured in region {region} "
+        f"in {total:.2f}s. It is ready for file uploads.\n" + "\n".join(report)
+    )
+
+# --- Code Artifacts ---
+# Code templates for the functions the tools create. A template is zipped
+# deterministically once per container and keyed by the SHA-256 of the zip,
+# so every function created from it shares one artifact. With
+# ARTIFACT_BUCKET set (a bucket in the same region as the functions, which
+# Lambda requires), the zip is uploaded there once and functions reference
+# it by S3Bucket/S3Key; otherwise the cached bytes are sent inline.
+ARTIFACT_BUCKET = os.environ.get('ARTIFACT_BUCKET', '')
+ARTIFACT_PREFIX = 'cloudcraft-artifacts/'
+ZIP_EPOCH = (1980, 1, 1, 0, 0, 0)
+
+HELLO_WORLD_SOURCE = """import json
+
+def lambda_handler(event, context):
+    return {
+        'statusCode': 200,
+        'body': json.dumps('Hello, World!')
+    }
+"""
+
+CODE_TEMPLATES = {
+    'hello_world': {
+        'files': {'lambda.py': HELLO_WORLD_SOURCE},
+        'handler': 'lambda.lambda_handler',
+        'runtime': 'python3.12',
+    },
+}
+
+def build_template_zip(files):
+    """
+    Zips {name: source} deterministically (sorted entries, fixed timestamps
+    and permissions), so equal code always gives equal bytes. setup.py
+    packages this Lambda with it too.
+    """
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w') as z:
+        for name in sorted(files):
+            info = zipfile.ZipInfo(name, date_time=ZIP_EPOCH)
+            info.create_system = 3 # Unix, whatever OS builds the package
+            info.external_attr = 0o644 << 16
+            info.compress_type = zipfile.ZIP_DEFLATED
+            z.writestr(info, files[name], compresslevel=9)
+    return buffer.getvalue()
+
+class ArtifactCache:
+    """Built template zips and the S3 keys they are known to exist under."""
+
+    def __init__(self, bucket):
+        self.bucket = bucket
+        self._lock = threading.Lock()
+        self._upload_lock = threading.Lock()
+        self._zips = {}
+        self._in_bucket = set()
+        self.counts = {'builds': 0, 'memoryHits': 0, 'uploads': 0, 'bucketHits': 0, 'inline': 0}
+
+    def _count(self, name):
+        with self._lock:
+            self.counts[name] += 1
+
+    def package(self, template):
+        """Returns (zip bytes, sha256 hex) for a template, building it on first use."""
+        with self._lock:
+            cached = self._zips.get(template)
+            if cached is not None:
+                self.counts['memoryHits'] += 1
+                return cached
+        zip_bytes = build_template_zip(CODE_TEMPLATES[template]['files'])
+        with self._lock:
+            if template not in self._zips:
+                self._zips[template] = (zip_bytes, hashlib.sha256(zip_bytes).hexdigest())
+                self.counts['builds'] += 1
+            return self._zips[template]
+
+    def _ensure_uploaded(self, key, zip_bytes):
+        """Makes sure the artifact is in the bucket. Returns 'uploaded', 'reused' or None on failure."""
+        if key in self._in_bucket:
+            self._count('bucketHits')
+            return 'reused'
+        # One upload per artifact, even when a fleet creates 50 functions at once
+        with self._upload_lock:
+            if key in self._in_bucket:
+                self._count('bucketHits')
+                return 'reused'
+            s3 = get_client('s3')
+            try:
+                s3.head_object(Bucket=self.bucket, Key=key)
+                outcome = 'reused'
+                self._count('bucketHits')
+            except s3.exceptions.ClientError as e:
+                if e.response.get('Error', {}).get('Code') not in ('404', 'NoSuchKey', 'NotFound'):
+                    print(f"Artifact bucket {self.bucket} unavailable, sending code inline: {e}")
+                    return None
+                try:
+                    s3.put_object(Bucket=self.bucket, Key=key, Body=zip_bytes, ContentType='application/zip')
+                except Exception as upload_error:
+                    print(f"Artifact upload to {self.bucket} failed, sending code inline: {upload_error}")
+                    return None
+                outcome = 'uploaded'
+                self._count('uploads')
+            self._in_bucket.add(key)
+            return outcome
+
+    def code(self, template):
+        """Returns (Code argument for create_function, short description of where it came from)."""
+        zip_bytes, digest = self.package(template)
+        label = f"{template} artifact {digest[:12]}"
+        if self.bucket:
+            key = f"{ARTIFACT_PREFIX}{template}/{digest}.zip"
+            outcome = self._ensure_uploaded(key, zip_bytes)
+            if outcome is not None:
+                return {'S3Bucket': self.bucket, 'S3Key': key}, f"{label}, {outcome} in s3://{self.bucket}/{key}"
+        self._count('inline')
+        return {'ZipFile': zip_bytes}, f"{label}, sent inline"
+
+    def stats(self):
+        with self._lock:
+            return dict(self.counts, templates=len(self._zips))
+
+artifact_cache = ArtifactCache(ARTIFACT_BUCKET)
 
 def create_hello_world_lambda(function_name, role_arn):
     """Creates a simple 'Hello World' Lambda function using boto3."""
+    template = CODE_TEMPLATES['hello_world']
     try:
-        # Dummy "hello world" Python code zip content (replace with real packaging if needed)
-        zip_content = b'UEsDBBQAAAAIAAAAAAAAAAAAAAAAAAAAAAAACgAAAGxhbWJkYS5weVVUCQAD42iPZONoj2R1eAsAAQT1AQAABBQAAAAKAFBLAwQUAAAACAAzRj9XAAAAAAAAAAAAAAAACgAAAGxhbWJkYS5weVVUCQAD42iPZONoj2R1eAsAAQT1AQAABBQAAABNj8EKwjAQRO/5ij1L8CBFwaYPELyJ3sU2bJNJpdbS37fK6OHh5eHlIcyjsyhzg+bH4Y6xG7pM4LwzBwzD4R4s65lFQRBwL+M8kYTnyMgt43A3w4JvRT45PArvYxK2KZbI2hM2i5n8SL7k4Z28v/Xz/T8AAAD//wMAUEsBAi0AFAAAAAgAAAAAAAAAAAAAAAAAAAAAAAoAAAAAAAAAAAAAAL8AAAAAbGFtYmRhLnB5VVQJAAOjaI9k42iPZHV4CwABBPQBAAAEFAAAAABQSwECLQAUAAAACAAzRj9XAAAAAAAAAAAAAAAACgAAAAAAAAAAAAAAnwAAAGxhbWJkYS5weVVUCQAD42iPZONoj2R1eAsAAQT1AQAABBQAAAAAUEsFBgAAAAACAAIAfgAAAIgAAAAAAA=='
-        zip_file = base64.b64decode(zip_content)
-
-        response = lambda_client.create_function(
+        code, code_source = artifact_cache.code('hello_world')
+        response = get_client('lambda').create_function(
             FunctionName=function_name,
-            Runtime='python3.12', # Or your preferred runtime
+            Runtime=template['runtime'],
             Role=role_arn,
-            Handler='lambda.lambda_handler', # Assumes the handler file is lambda.py and function is lambda_handler
-            Code={'ZipFile': zip_file},
+            Handler=template['handler'],
+            Code=code,
             Publish=True
         )
-        return f"Success: Lambda function '{function_name}' created. ARN: {response['FunctionArn']}"
-    except lambda_client.exceptions.ResourceConflictException:
+        return f"Success: Lambda function '{function_name}' created. ARN: {response['FunctionArn']} (code: {code_source})"
+    except get_client('lambda').exceptions.ResourceConflictException:
         return f"Error: Lambda function '{function_name}' already exists."
     except Exception as e:
         return f"Error: Failed to create Lambda function '{function_name}'. Reason: {str(e)}"
 
+# --- Fleet Tools ---
+# Batch variants that fan out over a bounded thread pool. The action group
+# Lambda has a 120 s timeout (see create_lambda_function in setup.py), so a
+# batch stops starting new items once its time budget is used up and
+# reports them as not started instead of being killed mid-way.
+FLEET_MAX_ITEMS = 50
+FLEET_TIME_BUDGET = 100.0 # Seconds, used when the Lambda context is not available
+FLEET_SAFETY_MARGIN = 10.0 # Seconds kept free to build and return the response
+
+def parse_name_list(value):
+    """Accepts a JSON array, '[a, b]' or 'a, b' and returns a list of names."""
+    if isinstance(value, list):
+        names = value
+    else:
+        try:
+            names = json.loads(value)
+        except (TypeError, ValueError):
+            names = str(value).strip().strip('[]').split(',')
+        if isinstance(names, str):
+            names = [names]
+    cleaned = []
+    for name in names:
+        name = str(name).strip().strip('"\'')
+        if name and name not in cleaned:
+            cleaned.append(name)
+    return cleaned
+
+def run_fleet(title, names, call, deadline):
+    """Runs call(name) for every name on the pool and returns a compact result table."""
+    if not names:
+        return f"Error: {title} needs at least one name."
+    if len(names) > FLEET_MAX_ITEMS:
+        return f"Error: {title} accepts at most {FLEET_MAX_ITEMS} names per call, got {len(names)}."
+
+    started_at = time.monotonic()
+    rows = {}
+
+    def run(name):
+        if time.monotonic() >= deadline:
+            return name, 'not started', 0.0, 'Time budget used up; call again with the remaining names.'
+        item_started_at = time.monotonic()
+        result = call(name)
+        status = 'ok' if result.startswith('Success') else 'failed'
+        return name, status, time.monotonic() - item_started_at, result.splitlines()[0]
+
+    pool = ThreadPoolExecutor(max_workers=min(FLEET_MAX_WORKERS, len(names)))
+    try:
+        futures = [pool.submit(run, name) for name in names]
+        wait(futures, timeout=max(0.0, deadline - time.monotonic()))
+        for name, future in zip(names, futures):
+            if future.done():
+                _, status, seconds, detail = future.result()
+                rows[name] = (status, seconds, detail)
+            elif future.cancel():
+                rows[name] = ('not started', None, 'Time budget used up; call again with the remaining names.')
+            else:
+                rows[name] = ('timed out', None, 'Still running when the time budget ran out; check it before retrying.')
+    finally:
+        # Do not wait for calls that are still running past the deadline
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    counts = {}
+    for status, _, _ in rows.values():
+        counts[status] = counts.get(status, 0) + 1
+    summary = ", ".join(f"{count} {status}" for status, count in counts.items())
+    lines = [
+        f"{'Success' if counts.get('ok') == len(names) else 'Error'}: {title} finished for {len(names)} items "
+        f"in {time.monotonic() - started_at:.2f}s ({summary}).",
+        "name | status | seconds | detail",
+    ]
+    for name in names:
+        status, seconds, detail = rows[name]
+        lines.append(f"{name} | {status} | {'-' if seconds is None else f'{seconds:.2f}'} | {detail}")
+    return "\n".join(lines)
+
+def fleet_deadline(context):
+    """Monotonic time by which a batch must stop starting new work."""
+    budget = FLEET_TIME_BUDGET
+    if context is not None and hasattr(context, 'get_remaining_time_in_millis'):
+        budget = context.get_remaining_time_in_millis() / 1000.0 - FLEET_SAFETY_MARGIN
+    return time.monotonic() + max(0.0, budget)
+
+def deploy_static_sites(bucket_names, region="us-east-1", deadline=None):
+    """Runs deploy_static_site for many buckets in parallel."""
+    deadline = deadline if deadline is not None else fleet_deadline(None)
+    return run_fleet('deploy_static_sites', parse_name_list(bucket_names),
+                     lambda name: deploy_static_site(name, region), deadline)
+
+def create_hello_world_lambdas(function_names, role_arn, deadline=None):
+    """Runs create_hello_world_lambda for many function names in parallel."""
+    deadline = deadline if deadline is not None else fleet_deadline(None)
+    before = artifact_cache.stats()
+    table = run_fleet('create_hello_world_lambdas', parse_name_list(function_names),
+                      lambda name: run_tool('create_hello_world_lambda', {'function_name': name, 'role_arn': role_arn}),
+                      deadline)
+    after = artifact_cache.stats()
+    delta = {name: after[name] - before[name] for name in ('builds', 'uploads', 'bucketHits', 'inline')}
+    if not any(delta.values()):
+        return table
+    return table + (
+        f"\nCode artifact: built {delta['builds']}x, uploaded {delta['uploads']}x, "
+        f"reused from the artifact bucket {delta['bucketHits']}x, sent inline {delta['inline']}x."
+    )
+
+# --- Tool Registry ---
+# Tool name -> handler and the function schema declared to the agent.
+# setup.py registers the action group from this table, so the parameters
+# validated here are exactly the ones Bedrock knows about.
+# 'state' is the resource state a successful call establishes, as
+# (resource kind, argument holding the resource name, state name); see
+# the idempotency section below.
+def _param(description, type='string', required=True):
+    return {'description': description, 'type': type, 'required': required}
+
+BUCKET_NAME_PARAM = _param('Name of the S3 bucket.')
+NEW_BUCKET_NAME_PARAM = _param('Globally unique name for the bucket.')
+REGION_PARAM = _param('The AWS region, e.g., us-east-1.')
+
+TOOLS = {
+    'create_s3_bucket': {
+        'handler': create_s3_bucket,
+        'description': 'Creates a new Amazon S3 bucket.',
+        'parameters': {'bucket_name': NEW_BUCKET_NAME_PARAM, 'region': REGION_PARAM},
+        'state': ('bucket', 'bucket_name', 'exists'),
+    },
+    'disable_s3_block_public_access': {
+        'handler': disable_s3_block_public_access,
+        'description': 'Disables block public access on an S3 bucket.',
+        'parameters': {'bucket_name': BUCKET_NAME_PARAM},
+        'state': ('bucket', 'bucket_name', 'public_access_unblocked'),
+    },
+    'set_public_read_policy': {
+        'handler': set_public_read_policy,
+        'description': 'Applies a public read-only policy to an S3 bucket.',
+        'parameters': {'bucket_name': BUCKET_NAME_PARAM},
+        'state': ('bucket', 'bucket_name', 'public_read_policy'),
+    },
+    'configure_s3_static_hosting': {
+        'handler': configure_s3_static_hosting,
+        'description': 'Enables static website hosting on a bucket.',
+        'parameters': {'bucket_name': BUCKET_NAME_PARAM},
+        'state': ('bucket', 'bucket_name', 'website_hosting'),
+    },
+    'deploy_static_site': {
+        'handler': deploy_static_site,
+        'description': 'Creates an S3 bucket and fully configures it for public static website hosting in one step.',
+        'parameters': {'bucket_name': NEW_BUCKET_NAME_PARAM, 'region': {**REGION_PARAM, 'required': False}},
+    },
+    'deploy_static_sites': {
+        'handler': deploy_static_sites,
+        'description': 'Deploys many static website buckets at once, in parallel. Returns a result table with one row per bucket.',
+        'parameters': {
+            'bucket_names': _param('List of globally unique bucket names (up to 50).', type='array'),
+            'region': {**REGION_PARAM, 'required': False},
+        },
+        'needs_deadline': True,
+    },
+    'create_hello_world_lambda': {
+        'handler': create_hello_world_lambda,
+        'description': "Creates a simple 'Hello World' Lambda function.",
+        'parameters': {
+            'function_name': _param('The name for the new Lambda function.'),
+            'role_arn': _param('The ARN of the IAM role for the Lambda to assume.'),
+        },
+        'state': ('function', 'function_name', 'exists'),
+    },
+    'create_hello_world_lambdas': {
+        'handler': create_hello_world_lambdas,
+        'description': "Creates many 'Hello World' Lambda functions at once, in parallel. Returns a result table with one row per function.",
+        'parameters': {
+            'function_names': _param('List of names for the new Lambda functions (up to 50).', type='array'),
+            'role_arn': _param('The ARN of the IAM role for the Lambdas to assume.'),
+        },
+        'needs_deadline': True,
+    },
+}
+
+def function_schema():
+    """The action group functionSchema['functions'] list for setup.py."""
+    return [
+        {'name': name, 'description': tool['description'], 'parameters': tool['parameters']}
+        for name, tool in TOOLS.items()
+    ]
+
+def _coerce(value, declared_type):
+    """Converts a parameter value (Bedrock sends strings) to its declared type."""
+    if declared_type == 'integer':
+        return int(value)
+    if declared_type == 'number':
+        return float(value)
+    if declared_type == 'boolean':
+        return value if isinstance(value, bool) else str(value).strip().lower() in ('true', '1', 'yes')
+    return value
+
+def validate_arguments(function_name, tool, args):
+    """Checks args against the declared schema. Returns (kwargs, error message or None)."""
+    declared = tool['parameters']
+    unknown = sorted(set(args) - set(declared))
+    if unknown:
+        return None, f"Error: Unknown parameter(s) {', '.join(unknown)} for '{function_name}'. Expected: {', '.join(declared)}."
+    missing = [name for name, spec in declared.items() if spec['required'] and args.get(name) in (None, '')]
+    if missing:
+        return None, f"Error: Missing required parameter(s) {', '.join(missing)} for '{function_name}'."
+    kwargs = {}
+    for name, value in args.items():
+        try:
+            kwargs[name] = _coerce(value, declared[name]['type'])
+        except (TypeError, ValueError):
+            return None, f"Error: Parameter '{name}' for '{function_name}' must be of type {declared[name]['type']}."
+    return kwargs, None
+
+# --- Idempotency ---
+# The agent often repeats a tool call within a conversation (retries, or
+# re-running a step it already did). Each successful call records the
+# resource state it established; a repeat call whose state is already known
+# returns the earlier success instead of hitting AWS again and handing the
+# LLM an error to reason about. The other arguments (region, role ARN) are
+# part of the key, so a repeat with different arguments still goes to AWS.
+# The cache lives in the warm Lambda container, and entries expire after
+# IDEMPOTENCY_TTL_SECONDS so changes made outside the agent are picked up
+# again. A TTL of 0 disables it.
+IDEMPOTENCY_TTL_SECONDS = float(os.environ.get('IDEMPOTENCY_TTL_SECONDS', '900'))
+IDEMPOTENCY_MAX_ENTRIES = 1000
+# Errors meaning the resource is gone, so everything known about it is stale
+RESOURCE_GONE_ERRORS = ('NoSuchBucket', 'ResourceNotFoundException')
+
+class ResourceStateCache:
+    """TTL-bounded map of (kind, name, state, other arguments) -> success message, with hit/miss counters."""
+
+    def __init__(self, ttl, max_entries):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.monotonic() - entry[1] > self.ttl:
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return entry
+
+    def put(self, key, message):
+        with self._lock:
+            if len(self._entries) >= self.max_entries:
+                # Drop the oldest entry (dicts keep insertion order)
+                self._entries.pop(next(iter(self._entries)))
+            self._entries.pop(key, None)
+            self._entries[key] = (message, time.monotonic())
+
+    def invalidate(self, kind, name):
+        with self._lock:
+            for key in [k for k in self._entries if k[:2] == (kind, name)]:
+                del self._entries[key]
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'entries': len(self._entries)}
+
+state_cache = ResourceStateCache(IDEMPOTENCY_TTL_SECONDS, IDEMPOTENCY_MAX_ENTRIES)
+
+def run_tool(function_name, kwargs):
+    """Runs a registered tool, short-circuiting calls whose result is already known."""
+    tool = TOOLS[function_name]
+    state = tool.get('state')
+    if state is None or state_cache.ttl <= 0:
+        return tool['handler'](**kwargs)
+
+    kind, name_arg, state_name = state
+    arguments = tuple(sorted((k, v) for k, v in kwargs.items() if k != name_arg))
+    key = (kind, kwargs[name_arg], state_name, arguments)
+    cached = state_cache.get(key)
+    if cached is not None:
+        message, recorded_at = cached
+        age = time.monotonic() - recorded_at
+        return f"{message} (Already done {age:.0f}s ago; repeated call skipped.)"
+
+    result = tool['handler'](**kwargs)
+    if result.startswith('Success'):
+        state_cache.put(key, result)
+    elif any(error in result for error in RESOURCE_GONE_ERRORS):
+        state_cache.invalidate(kind, kwargs[name_arg])
+    return result
+
+INIT_DURATION_MS = round((time.perf_counter() - _INIT_STARTED_AT) * 1000, 2)
+_cold_start = True
+
 # --- Main Handler (CRITICAL UPDATE HERE) ---
 def lambda_handler(event, context):
+    global _cold_start
+    started_at = time.perf_counter()
+    cold = _cold_start
+    _cold_start = False
+    if cold:
+        log_event('init', initDurationMs=INIT_DURATION_MS)
+    if METRICS_ENABLED:
+        aws_calls.reset()
+
     # This new event format is simpler
     function_name = event['function']
     parameters_list = event.get('parameters', [])
-    
+
     # Convert the list of parameters into a simple dictionary
     args = {param['name']: param['value'] for param in parameters_list}
-    
-    print(f"Invoked function: {function_name} with arguments: {args}")
-
-    response_body = ""
-    # Determine which function to call based on the function name
-    if function_name == 'create_s3_bucket':
-        response_body = create_s3_bucket(**args)
-    elif function_name == 'disable_s3_block_public_access':
-        response_body = disable_s3_block_public_access(**args)
-    elif function_name == 'set_public_read_policy':
-        response_body = set_public_read_policy(**args)
-    elif function_name == 'configure_s3_static_hosting':
-        response_body = configure_s3_static_hosting(**args)
-    elif function_name == 'create_hello_world_lambda':
-        response_body = create_hello_world_lambda(**args)
-    else:
+
+    # Look up the tool in the registry and validate the arguments
+    tool = TOOLS.get(function_name)
+    if tool is None:
         response_body = f"Error: Unknown function '{function_name}'"
+    else:
+        kwargs, response_body = validate_arguments(function_name, tool, args)
+        if kwargs is not None:
+            if tool.get('needs_deadline'):
+                kwargs['deadline'] = fleet_deadline(context)
+            response_body = run_tool(function_name, kwargs)
+
+    log_event(
+        'invoke',
+        function=function_name,
+        arguments=args,
+        cold=cold,
+        status='ok' if response_body.startswith('Success') else 'error',
+        durationMs=round((time.perf_counter() - started_at) * 1000, 2),
+        stateCache=state_cache.stats(),
+        artifacts=artifact_cache.stats(),
+        **({'awsCalls': aws_calls.snapshot()} if METRICS_ENABLED else {}),
+    )
 
     # This is the response format Bedrock expects for this method
     response = {
@@ -104,5 +675,5 @@ def lambda_handler(event, context):
         },
         'messageVersion': event['messageVersion']
     }
-    
-    return response
\ No newline at end of file
+
+    return response
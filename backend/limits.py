@@ -0,0 +1,98 @@
+# backend/limits.py
+# Per-endpoint concurrency limits for app.py.
+# Each limited endpoint gets a fixed number of slots. A request that cannot
+# get a slot within QUEUE_TIMEOUT seconds is answered with 429 and a
+# Retry-After header instead of waiting in an unbounded queue, so a burst of
+# uploads can never starve the agent endpoint (or the other way round).
+import functools
+import os
+import threading
+
+from flask import jsonify, make_response
+
+# --- Tuning (override with environment variables) ---
+# Agent sessions being answered at the same time (buffered or streamed)
+AGENT_MAX_CONCURRENCY = int(os.environ.get('AGENT_MAX_CONCURRENCY', '64'))
+# /upload-files requests being processed at the same time; each one uses
+# up to UPLOAD_MAX_WORKERS upload threads
+UPLOAD_MAX_CONCURRENCY = int(os.environ.get('UPLOAD_MAX_CONCURRENCY', '4'))
+# /upload-stream requests being processed at the same time
+STREAM_UPLOAD_MAX_CONCURRENCY = int(os.environ.get('STREAM_UPLOAD_MAX_CONCURRENCY', '4'))
+# How long a request may wait for a free slot before getting a 429
+QUEUE_TIMEOUT = float(os.environ.get('QUEUE_TIMEOUT_SECONDS', '0.5'))
+# Seconds sent back in the Retry-After header of a 429
+RETRY_AFTER_SECONDS = 1
+
+class ConcurrencyLimit:
+    """A named counting semaphore that also keeps simple statistics."""
+
+    def __init__(self, name, limit):
+        self.name = name
+        self.limit = limit
+        self._slots = threading.BoundedSemaphore(limit)
+        self._lock = threading.Lock()
+        self._active = 0
+        self._peak = 0
+        self._admitted = 0
+        self._rejected = 0
+
+    def acquire(self, timeout=QUEUE_TIMEOUT):
+        if not self._slots.acquire(timeout=timeout):
+            with self._lock:
+                self._rejected += 1
+            return False
+        with self._lock:
+            self._active += 1
+            self._admitted += 1
+            self._peak = max(self._peak, self._active)
+        return True
+
+    def release(self):
+        with self._lock:
+            self._active -= 1
+        self._slots.release()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'limit': self.limit,
+                'active': self._active,
+                'peak': self._peak,
+                'admitted': self._admitted,
+                'rejected': self._rejected,
+            }
+
+agent_limit = ConcurrencyLimit('agent', AGENT_MAX_CONCURRENCY)
+upload_limit = ConcurrencyLimit('upload', UPLOAD_MAX_CONCURRENCY)
+stream_upload_limit = ConcurrencyLimit('upload_stream', STREAM_UPLOAD_MAX_CONCURRENCY)
+ALL_LIMITS = [agent_limit, upload_limit, stream_upload_limit]
+
+def limited(limit):
+    """
+    Decorator for a Flask view that holds one slot of `limit` while the
+    request runs. For streamed responses the slot is held until the last
+    byte has been sent, not just until the view returns.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            if not limit.acquire():
+                response = jsonify({"error": f"Server busy ({limit.name}); please retry shortly."})
+                response.status_code = 429
+                response.headers['Retry-After'] = str(RETRY_AFTER_SECONDS)
+                return response
+            try:
+                response = make_response(view(*args, **kwargs))
+            except BaseException:
+                limit.release()
+                raise
+            if response.is_streamed:
+                response.call_on_close(limit.release)
+            else:
+                limit.release()
+            return response
+        return wrapper
+    return decorator
+
+def limits_snapshot():
+    return {limit.name: limit.stats() for limit in ALL_LIMITS}
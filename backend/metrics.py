@@ -0,0 +1,248 @@
+# backend/metrics.py
+# In-process metrics for app.py, served in the Prometheus text format at
+# GET /metrics:
+#   - Bedrock agent calls: time to first chunk, total time, chunks, bytes
+#   - per-file S3 uploads: latency and throughput
+#   - every AWS API call made by the backend's clients: latency and retries
+#   - agent requests by route (fast path or agent), concurrency limits
+# With METRICS_ENABLED=0 nothing is recorded: the record functions return
+# before doing any work, the Bedrock stream is not wrapped, clients get no
+# event handlers, and /metrics answers 404.
+import bisect
+import json
+import os
+import threading
+import time
+
+# --- Tuning (override with environment variables) ---
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '1').lower() not in ('0', 'false', 'no')
+# Also print one JSON line per Bedrock call
+METRICS_LOG_SPANS = os.environ.get('METRICS_LOG_SPANS', '1').lower() not in ('0', 'false', 'no')
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+THROUGHPUT_BUCKETS = (0.1, 0.5, 1, 5, 10, 25, 50, 100, 250, 500)
+SIZE_BUCKETS = (1024, 16 * 1024, 128 * 1024, 1024 ** 2, 8 * 1024 ** 2, 64 * 1024 ** 2, 512 * 1024 ** 2)
+COUNT_BUCKETS = (1, 5, 10, 25, 50, 100, 250, 1000)
+
+def _labels(names, values):
+    if not names:
+        return ''
+    pairs = ','.join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+    return '{' + pairs + '}'
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Counter:
+    """A monotonically increasing count per label combination."""
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def inc(self, *label_values, amount=1):
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} counter']
+        with self._lock:
+            for values, count in sorted(self._values.items()):
+                lines.append(f'{self.name}{_labels(self.labels, values)} {_number(count)}')
+        return lines
+
+class Histogram:
+    """Cumulative buckets, sum and count per label combination."""
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._series = {}
+
+    def observe(self, value, *label_values):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                # Per-bucket counts (the last one is +Inf), then sum
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        names = self.labels + ('le',)
+        with self._lock:
+            for values, (counts, total) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets + ('+Inf',), counts):
+                    cumulative += count
+                    lines.append(f'{self.name}_bucket{_labels(names, values + (bound,))} {cumulative}')
+                lines.append(f'{self.name}_sum{_labels(self.labels, values)} {_number(round(total, 6))}')
+                lines.append(f'{self.name}_count{_labels(self.labels, values)} {cumulative}')
+        return lines
+
+class Gauge:
+    """
+    Values read from a callback when /metrics is scraped. `kind` is the
+    Prometheus type; use 'counter' for totals kept elsewhere.
+    """
+
+    def __init__(self, name, help, labels, collect, kind='gauge'):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.collect = collect # () -> [(label values, value)]
+        self.kind = kind
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} {self.kind}']
+        for values, value in self.collect():
+            if value is not None:
+                lines.append(f'{self.name}{_labels(self.labels, values)} {_number(value)}')
+        return lines
+
+REGISTRY = []
+
+def _register(metric):
+    REGISTRY.append(metric)
+    return metric
+
+def register_gauge(name, help, labels, collect, kind='gauge'):
+    return _register(Gauge(name, help, labels, collect, kind))
+
+# --- Metrics ---
+agent_ttfb = _register(Histogram(
+    'cloudcraft_agent_first_chunk_seconds', 'Time from invoke_agent to the first decoded chunk.', ('mode',)))
+agent_duration = _register(Histogram(
+    'cloudcraft_agent_stream_seconds', 'Time from invoke_agent to the end of the completion stream.', ('mode', 'outcome')))
+agent_chunks = _register(Histogram(
+    'cloudcraft_agent_chunks', 'Chunks per agent reply.', ('mode',), COUNT_BUCKETS))
+agent_bytes = _register(Counter(
+    'cloudcraft_agent_reply_bytes_total', 'Bytes received from the agent.', ('mode',)))
+request_duration = _register(Histogram(
+    'cloudcraft_invoke_agent_seconds', 'Answered /invoke-agent requests by route.', ('route',)))
+upload_duration = _register(Histogram(
+    'cloudcraft_s3_upload_seconds', 'Time to upload one file to S3.', ('source', 'status')))
+upload_throughput = _register(Histogram(
+    'cloudcraft_s3_upload_mb_per_second', 'Per-file upload throughput.', ('source',), THROUGHPUT_BUCKETS))
+upload_size = _register(Histogram(
+    'cloudcraft_s3_upload_file_bytes', 'Size of uploaded files.', ('source',), SIZE_BUCKETS))
+upload_bytes = _register(Counter(
+    'cloudcraft_s3_upload_bytes_total', 'Bytes uploaded to S3.', ('source',)))
+aws_call_duration = _register(Histogram(
+    'cloudcraft_aws_call_seconds', 'AWS API call latency, retries included.', ('service', 'operation', 'status')))
+aws_retries = _register(Counter(
+    'cloudcraft_aws_call_retries_total', 'Retries botocore made for AWS API calls.', ('service', 'operation')))
+
+# --- Recording ---
+def observe_request(route, seconds):
+    """Records a finished /invoke-agent request."""
+    if not METRICS_ENABLED:
+        return
+    request_duration.observe(seconds, route)
+
+def observe_upload(source, result):
+    """Records one per-file result from uploads.upload_one or the stream ingester."""
+    if not METRICS_ENABLED:
+        return
+    seconds = result['seconds']
+    upload_duration.observe(seconds, source, result['status'])
+    size = result.get('bytes')
+    if result['status'] == 'uploaded' and size is not None:
+        upload_size.observe(size, source)
+        upload_bytes.inc(source, amount=size)
+        if seconds > 0:
+            upload_throughput.observe(size / (1024 * 1024) / seconds, source)
+
+def observe_agent_stream(event_stream, started_at, mode):
+    """
+    Wraps a Bedrock completion stream so its time to first chunk, chunk
+    count, bytes and duration are recorded when it ends. Returns the stream
+    unchanged when metrics are off.
+    """
+    if not METRICS_ENABLED:
+        return event_stream
+    return _observed_agent_stream(event_stream, started_at, mode)
+
+def _observed_agent_stream(event_stream, started_at, mode):
+    first_chunk = None
+    chunks = 0
+    size = 0
+    outcome = 'error'
+    try:
+        for event in event_stream:
+            if 'chunk' in event:
+                if first_chunk is None:
+                    first_chunk = time.perf_counter() - started_at
+                chunks += 1
+                size += len(event['chunk'].get('bytes', b''))
+            yield event
+        outcome = 'ok'
+    except GeneratorExit:
+        # The client went away before the reply finished
+        outcome = 'cancelled'
+        raise
+    finally:
+        total = time.perf_counter() - started_at
+        if first_chunk is not None:
+            agent_ttfb.observe(first_chunk, mode)
+        agent_duration.observe(total, mode, outcome)
+        agent_chunks.observe(chunks, mode)
+        agent_bytes.inc(mode, amount=size)
+        if METRICS_LOG_SPANS:
+            print(json.dumps({
+                'span': 'bedrock.invoke_agent', 'mode': mode, 'outcome': outcome,
+                'firstChunkMs': round(first_chunk * 1000, 1) if first_chunk is not None else None,
+                'totalMs': round(total * 1000, 1), 'chunks': chunks, 'bytes': size,
+            }))
+
+def instrument_client(client):
+    """Records the latency and retries of every API call made with a boto3 client."""
+    if not METRICS_ENABLED:
+        return client
+    service = client.meta.service_model.service_name
+    events = client.meta.events
+    events.register('before-call', _call_started, unique_id='cloudcraft-metrics-start')
+    events.register('after-call', lambda **kwargs: _call_finished(service, **kwargs),
+                    unique_id='cloudcraft-metrics-finish')
+    events.register('after-call-error', lambda **kwargs: _call_failed(service, **kwargs),
+                    unique_id='cloudcraft-metrics-error')
+    return client
+
+def _call_started(model, context, **kwargs):
+    context['metrics_operation'] = model.name
+    context['metrics_started_at'] = time.perf_counter()
+
+def _call_finished(service, model, parsed, context, **kwargs):
+    started_at = context.get('metrics_started_at')
+    if started_at is None:
+        return
+    status = 'error' if 'Error' in parsed else 'ok'
+    aws_call_duration.observe(time.perf_counter() - started_at, service, model.name, status)
+    retries = parsed.get('ResponseMetadata', {}).get('RetryAttempts', 0)
+    if retries:
+        aws_retries.inc(service, model.name, amount=retries)
+
+def _call_failed(service, context, **kwargs):
+    # Connection errors that survived every retry
+    started_at = context.get('metrics_started_at')
+    if started_at is None:
+        return
+    aws_call_duration.observe(time.perf_counter() - started_at, service, context['metrics_operation'], 'error')
+
+def render():
+    """All metrics in the Prometheus text exposition format."""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
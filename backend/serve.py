@@ -0,0 +1,104 @@
+# backend/serve.py
+# Production entry point for the backend:
+#   python -m backend.serve [--host 127.0.0.1] [--port 5001] [--upload-port 5002]
+#
+# `python -m backend.app` runs Flask's single-process debug server, which
+# is fine for development. This runs the same app on waitress, a
+# multi-threaded WSGI server that works on Windows, macOS and Linux.
+#
+# waitress queues requests internally whenever all its threads are busy,
+# and that queue has no bound. So there is one thread per accepted
+# connection: every request reaches the per-endpoint limits in
+# backend/limits.py at once, and whatever they don't admit gets a quick 429
+# instead of waiting. Connections beyond the limit wait in the OS backlog.
+#
+# waitress reads the whole request body before calling the app, and spools
+# bodies over 512 KB to temporary files. So on --port, /upload-stream only
+# starts sending to S3 once the upload has fully arrived, and the upload
+# limits answer 429 only after that. Bodies there are capped at
+# SERVER_MAX_REQUEST_BODY_MB. --upload-port runs the same app on Werkzeug's
+# threaded server, which hands the socket stream to the app: send large
+# uploads and site archives there.
+import argparse
+import os
+import threading
+
+from werkzeug.serving import ThreadedWSGIServer
+
+from backend.app import app
+from backend.limits import AGENT_MAX_CONCURRENCY, STREAM_UPLOAD_MAX_CONCURRENCY, UPLOAD_MAX_CONCURRENCY
+
+# Threads beyond the limited slots, for unlimited endpoints (router stats,
+# CORS preflights) and for requests that are about to get a 429
+SPARE_THREADS = 32
+LIMITED_SLOTS = AGENT_MAX_CONCURRENCY + UPLOAD_MAX_CONCURRENCY + STREAM_UPLOAD_MAX_CONCURRENCY
+# Connections (and threads) served at once, idle keep-alive connections included
+SERVER_THREADS = max(int(os.environ.get('SERVER_THREADS', '256')), LIMITED_SLOTS + SPARE_THREADS)
+# Largest request body waitress accepts, in MB. Each one is buffered on disk
+# before the app sees it; --upload-port has no such cap.
+MAX_REQUEST_BODY_MB = int(os.environ.get('SERVER_MAX_REQUEST_BODY_MB', '64'))
+# Connections served at once on --upload-port
+UPLOAD_SERVER_THREADS = UPLOAD_MAX_CONCURRENCY + STREAM_UPLOAD_MAX_CONCURRENCY + SPARE_THREADS
+
+def server_options():
+    """Keyword arguments for waitress, shared with benchmarks/load_test.py."""
+    return {
+        'threads': SERVER_THREADS,
+        'connection_limit': SERVER_THREADS,
+        'max_request_body_size': MAX_REQUEST_BODY_MB * 1024 * 1024,
+        # Streamed agent replies can pause between chunks while tools run
+        'channel_timeout': 300,
+        'ident': 'cloudcraft',
+    }
+
+class StreamingServer(ThreadedWSGIServer):
+    """
+    Werkzeug's threaded server, which streams request bodies to the app,
+    with at most `max_connections` connections served at once.
+    """
+
+    def __init__(self, host, port, app, max_connections):
+        super().__init__(host, port, app)
+        self.slots = threading.BoundedSemaphore(max_connections)
+
+    def process_request(self, request, client_address):
+        # Stop accepting while every slot is busy; new connections wait in the OS backlog
+        self.slots.acquire()
+        try:
+            super().process_request(request, client_address)
+        except BaseException:
+            self.slots.release()
+            raise
+
+    def process_request_thread(self, request, client_address):
+        try:
+            super().process_request_thread(request, client_address)
+        finally:
+            self.slots.release()
+
+def serve(host, port, upload_port=None):
+    if upload_port:
+        upload_server = StreamingServer(host, upload_port, app, UPLOAD_SERVER_THREADS)
+        print(f"Serving uploads on http://{host}:{upload_port} with {UPLOAD_SERVER_THREADS} threads")
+        threading.Thread(target=upload_server.serve_forever, daemon=True).start()
+    try:
+        from waitress import serve as waitress_serve
+    except ImportError:
+        print("waitress is not installed (pip install waitress); using Werkzeug's threaded server.")
+        print(f"Serving on http://{host}:{port} with {SERVER_THREADS} threads")
+        StreamingServer(host, port, app, SERVER_THREADS).serve_forever()
+        return
+    print(f"Serving on http://{host}:{port} with {SERVER_THREADS} threads")
+    waitress_serve(app, host=host, port=port, **server_options())
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the backend on a multi-threaded WSGI server.")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5001)
+    parser.add_argument('--upload-port', type=int, default=5002,
+                        help='port for large and streamed uploads (0 to turn off)')
+    args = parser.parse_args()
+    serve(args.host, args.port, args.upload_port)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,270 @@
+# backend/uploads.py
+# Upload engine used by the /upload-files endpoint in app.py.
+import hashlib
+import mimetypes
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
+
+from backend.metrics import observe_upload
+
+MB = 1024 * 1024
+
+# --- Tuning (override with environment variables) ---
+# Number of files uploaded at the same time
+UPLOAD_MAX_WORKERS = int(os.environ.get('UPLOAD_MAX_WORKERS', '16'))
+# Files larger than this are sent as S3 multipart uploads
+MULTIPART_THRESHOLD = int(os.environ.get('UPLOAD_MULTIPART_THRESHOLD_MB', '16')) * MB
+# Size of each multipart part (S3 minimum is 5 MB)
+MULTIPART_CHUNKSIZE = max(int(os.environ.get('UPLOAD_MULTIPART_CHUNKSIZE_MB', '8')) * MB, 5 * MB)
+# Parts of a single large file uploaded at the same time
+MULTIPART_CONCURRENCY = int(os.environ.get('UPLOAD_MULTIPART_CONCURRENCY', '4'))
+
+# One transfer config shared by every upload
+TRANSFER_CONFIG = TransferConfig(
+    multipart_threshold=MULTIPART_THRESHOLD,
+    multipart_chunksize=MULTIPART_CHUNKSIZE,
+    max_concurrency=MULTIPART_CONCURRENCY,
+    use_threads=True,
+)
+
+# Botocore config for the shared S3 client. The connection pool must be big
+# enough for every worker's multipart threads, otherwise urllib3 discards
+# connections and each request pays a fresh TLS handshake.
+S3_CLIENT_CONFIG = Config(
+    max_pool_connections=UPLOAD_MAX_WORKERS * MULTIPART_CONCURRENCY,
+    tcp_keepalive=True,
+    retries={'max_attempts': 5, 'mode': 'adaptive'},
+)
+
+# Content types for common web files. Checked before the mimetypes module,
+# whose answers depend on the OS (on Windows it reads the registry, which
+# can map .js to text/plain and break every script on the site).
+WEB_CONTENT_TYPES = {
+    '.html': 'text/html', '.htm': 'text/html', '.css': 'text/css',
+    '.js': 'application/javascript', '.mjs': 'application/javascript',
+    '.json': 'application/json', '.map': 'application/json',
+    '.webmanifest': 'application/manifest+json', '.xml': 'application/xml',
+    '.txt': 'text/plain', '.csv': 'text/csv', '.md': 'text/markdown',
+    '.png': 'image/png', '.jpg': 'image/jpeg', '.jpeg': 'image/jpeg',
+    '.gif': 'image/gif', '.svg': 'image/svg+xml', '.webp': 'image/webp',
+    '.avif': 'image/avif', '.ico': 'image/x-icon',
+    '.woff': 'font/woff', '.woff2': 'font/woff2', '.ttf': 'font/ttf',
+    '.otf': 'font/otf', '.eot': 'application/vnd.ms-fontobject',
+    '.mp4': 'video/mp4', '.webm': 'video/webm', '.mp3': 'audio/mpeg',
+    '.wasm': 'application/wasm', '.pdf': 'application/pdf',
+}
+
+def guess_content_type(filename):
+    """Content-Type detection based on extension."""
+    extension = os.path.splitext(filename)[1].lower()
+    if extension in WEB_CONTENT_TYPES:
+        return WEB_CONTENT_TYPES[extension]
+    content_type, _ = mimetypes.guess_type(filename, strict=False)
+    return content_type or 'application/octet-stream' # Default
+
+def _stream_size(stream):
+    """Returns the size of a seekable stream without reading it."""
+    try:
+        position = stream.tell()
+        stream.seek(0, os.SEEK_END)
+        size = stream.tell() - position
+        stream.seek(position)
+        return size
+    except (AttributeError, OSError, ValueError):
+        return None
+
+def upload_one(s3_client, bucket_name, key, fileobj, metadata=None, headers=None):
+    """
+    Uploads a single file object and returns its per-file result.
+    `headers` are extra S3 upload arguments (ContentEncoding, CacheControl...)
+    and override the guessed ContentType.
+    """
+    size = _stream_size(fileobj)
+    started_at = time.perf_counter()
+    extra_args = {
+        # 'ACL': 'public-read', # Make files publicly readable for website hosting
+        'ContentType': guess_content_type(key)
+    }
+    if metadata:
+        extra_args['Metadata'] = metadata
+    if headers:
+        extra_args.update(headers)
+    try:
+        s3_client.upload_fileobj(
+            fileobj,                # The file object stream
+            bucket_name,            # Target S3 bucket name
+            key,                    # S3 object key
+            ExtraArgs=extra_args,
+            Config=TRANSFER_CONFIG
+        )
+        status, error = 'uploaded', None
+    except Exception as e:
+        print(f"Error uploading {key}: {e}")
+        status, error = 'error', f"Failed to upload {key}: {str(e)}"
+    seconds = time.perf_counter() - started_at
+    result = {"key": key, "status": status, "bytes": size, "seconds": round(seconds, 4)}
+    if error:
+        result["error"] = error
+    observe_upload('upload_files', result)
+    return result
+
+def upload_files(s3_client, bucket_name, files, max_workers=UPLOAD_MAX_WORKERS):
+    """
+    Uploads (key, file object[, metadata[, headers]]) tuples to the bucket on
+    a bounded thread pool.
+    Returns per-file results plus aggregate throughput.
+    """
+    started_at = time.perf_counter()
+    workers = max(1, min(max_workers, len(files)))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='s3-upload') as pool:
+        results = list(pool.map(lambda item: upload_one(s3_client, bucket_name, *item), files))
+    return summarize(results, time.perf_counter() - started_at)
+
+def summarize(results, seconds):
+    """Builds the aggregate upload report returned to the frontend."""
+    uploaded = [r for r in results if r["status"] == "uploaded"]
+    total_bytes = sum(r["bytes"] or 0 for r in uploaded)
+    return {
+        "uploaded": len(uploaded),
+        "errors": [r["error"] for r in results if r["status"] == "error"],
+        "files": results,
+        "stats": {
+            "bytes": total_bytes,
+            "seconds": round(seconds, 4),
+            "filesPerSecond": round(len(uploaded) / seconds, 2) if seconds > 0 else None,
+            "mbPerSecond": round(total_bytes / MB / seconds, 3) if seconds > 0 else None,
+        },
+    }
+
+# --- Sync mode ---
+# Like `aws s3 sync`: only new or changed files are uploaded, and objects
+# that no longer exist locally can optionally be deleted.
+
+HASH_BLOCK_SIZE = 1 * MB
+# User metadata key holding the MD5 of the uploaded content. Needed because
+# multipart and SSE-KMS ETags are not a plain MD5 of the object.
+MD5_METADATA_KEY = 'content-md5'
+
+def list_bucket_objects(s3_client, bucket_name):
+    """Lists every object in the bucket once. Returns {key: {'etag', 'size'}}."""
+    objects = {}
+    paginator = s3_client.get_paginator('list_objects_v2')
+    for page in paginator.paginate(Bucket=bucket_name):
+        for obj in page.get('Contents', []):
+            objects[obj['Key']] = {'etag': obj['ETag'].strip('"'), 'size': obj['Size']}
+    return objects
+
+def content_digests(fileobj):
+    """
+    Hashes a seekable stream in one pass and rewinds it.
+    Returns (size, md5 hex, expected multipart ETag or None). The multipart
+    ETag is what S3 reports for files we upload with TRANSFER_CONFIG.
+    """
+    start = fileobj.tell()
+    whole = hashlib.md5()
+    part = hashlib.md5()
+    part_digests = []
+    part_bytes = 0
+    size = 0
+    while True:
+        block = fileobj.read(HASH_BLOCK_SIZE)
+        if not block:
+            break
+        whole.update(block)
+        part.update(block)
+        size += len(block)
+        part_bytes += len(block)
+        if part_bytes >= MULTIPART_CHUNKSIZE:
+            part_digests.append(part.digest())
+            part, part_bytes = hashlib.md5(), 0
+    if part_bytes:
+        part_digests.append(part.digest())
+    fileobj.seek(start)
+
+    multipart_etag = None
+    if size >= MULTIPART_THRESHOLD:
+        multipart_etag = f"{hashlib.md5(b''.join(part_digests)).hexdigest()}-{len(part_digests)}"
+    return size, whole.hexdigest(), multipart_etag
+
+def _is_unchanged(s3_client, bucket_name, key, remote, size, md5, multipart_etag):
+    """Decides whether the object in the bucket already has this content."""
+    if remote is None or remote['size'] != size:
+        return False
+    if remote['etag'] in (md5, multipart_etag):
+        return True
+    # ETag is not comparable (other part size, SSE-KMS...): check stored hash
+    try:
+        head = s3_client.head_object(Bucket=bucket_name, Key=key)
+    except Exception:
+        return False
+    return head.get('Metadata', {}).get(MD5_METADATA_KEY) == md5
+
+def delete_stale_objects(s3_client, bucket_name, keys):
+    """Deletes keys in batches of 1000 (the DeleteObjects limit). Returns (deleted, errors)."""
+    deleted = 0
+    errors = []
+    keys = sorted(keys)
+    for i in range(0, len(keys), 1000):
+        batch = keys[i:i + 1000]
+        try:
+            response = s3_client.delete_objects(
+                Bucket=bucket_name,
+                Delete={'Objects': [{'Key': key} for key in batch], 'Quiet': True}
+            )
+        except Exception as e:
+            print(f"Error deleting stale objects from {bucket_name}: {e}")
+            errors.extend(f"Failed to delete {key}: {str(e)}" for key in batch)
+            continue
+        failed = response.get('Errors', [])
+        deleted += len(batch) - len(failed)
+        errors.extend(f"Failed to delete {err['Key']}: {err.get('Message', err.get('Code'))}" for err in failed)
+    return deleted, errors
+
+def sync_files(s3_client, bucket_name, files, delete=False, max_workers=UPLOAD_MAX_WORKERS):
+    """
+    Uploads only the (key, file object[, metadata[, headers]]) items whose
+    content differs from the bucket, and with delete=True removes objects
+    that are not in `files`.
+    Returns the same report as upload_files plus a "sync" summary.
+    """
+    started_at = time.perf_counter()
+    remote_objects = list_bucket_objects(s3_client, bucket_name)
+
+    def plan(item):
+        key, fileobj, headers = item[0], item[1], (item[3] if len(item) > 3 else None)
+        size, md5, multipart_etag = content_digests(fileobj)
+        unchanged = _is_unchanged(s3_client, bucket_name, key, remote_objects.get(key), size, md5, multipart_etag)
+        return key, fileobj, headers, size, md5, unchanged
+
+    workers = max(1, min(max_workers, len(files)))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='s3-sync') as pool:
+        planned = list(pool.map(plan, files))
+        skipped = [
+            {"key": key, "status": "skipped", "bytes": size, "seconds": 0.0}
+            for key, _, _, size, _, unchanged in planned if unchanged
+        ]
+        to_upload = [
+            (key, fileobj, {MD5_METADATA_KEY: md5}, headers)
+            for key, fileobj, headers, _, md5, unchanged in planned if not unchanged
+        ]
+        results = list(pool.map(lambda item: upload_one(s3_client, bucket_name, *item), to_upload))
+
+    deleted, delete_errors = 0, []
+    if delete:
+        local_keys = {item[0] for item in files}
+        stale = [key for key in remote_objects if key not in local_keys]
+        deleted, delete_errors = delete_stale_objects(s3_client, bucket_name, stale)
+
+    report = summarize(skipped + results, time.perf_counter() - started_at)
+    report["errors"].extend(delete_errors)
+    report["sync"] = {
+        "skipped": len(skipped),
+        "uploaded": report["uploaded"],
+        "deleted": deleted,
+        "bytesSaved": sum(r["bytes"] for r in skipped),
+    }
+    return report
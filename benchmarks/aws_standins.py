@@ -0,0 +1,412 @@
+# benchmarks/aws_standins.py
+# Local stand-ins for the AWS services the project talks to, shared by the
+# offline benchmarks in this folder.
+#
+# - stub_client() answers a real boto3 client's requests in-process at the
+#   botocore 'before-send' hook, after a configurable latency. Parameter
+#   validation, serialization and response parsing still run, so the
+#   client-side cost is measured too.
+# - stub_bedrock_agent_runtime() and stub_s3() use it to answer InvokeAgent
+#   with a genuine event stream and S3 uploads (single and multipart).
+# - SimulatedClock and SimulatedAccount replace time and the IAM, Lambda and
+#   Bedrock Agent clients in setup.py, so a provisioning run that takes
+#   minutes against AWS finishes in a second or two.
+import base64
+import binascii
+import hashlib
+import json
+import struct
+import threading
+import time
+import uuid
+
+from botocore.awsrequest import AWSResponse
+
+# --- botocore stubbing ---
+
+class _RawBody:
+    """Response body for AWSResponse: fixed bytes or a generator of frames."""
+
+    def __init__(self, body):
+        self._body = body
+
+    def stream(self, **kwargs):
+        if isinstance(self._body, (bytes, bytearray)):
+            yield bytes(self._body)
+        else:
+            yield from self._body
+
+    def read(self, *args, **kwargs):
+        return b''.join(self.stream())
+
+def _request_size(request):
+    try:
+        return int(request.headers.get('Content-Length') or 0)
+    except (TypeError, ValueError):
+        return 0
+
+STUB_ID = 'benchmark-stand-in'
+
+def stub_client(client, handlers, request_ms=0.0, mb_per_second=None):
+    """
+    Answers every request of `client` locally. `handlers` maps an operation
+    name to fn(request) -> (status, headers, body); operations without a
+    handler get an empty 200. Each request first waits request_ms, plus the
+    transfer time of its body at mb_per_second. Stubbing the same client
+    again replaces the previous stand-in.
+    """
+    def respond(request, **kwargs):
+        operation = kwargs.get('event_name', '').rsplit('.', 1)[-1]
+        delay = request_ms / 1000
+        if mb_per_second:
+            delay += _request_size(request) / (mb_per_second * 1024 * 1024)
+        if delay:
+            time.sleep(delay)
+        handler = handlers.get(operation)
+        status, headers, body = handler(request) if handler else (200, {}, b'')
+        return AWSResponse(request.url, status, headers, _RawBody(body))
+
+    client.meta.events.unregister('before-send', unique_id=STUB_ID)
+    client.meta.events.register('before-send', respond, unique_id=STUB_ID)
+    return client
+
+# --- Bedrock Agent Runtime ---
+
+def encode_event(headers, payload):
+    """Encodes one message in the AWS event stream format (string headers only)."""
+    encoded_headers = b''
+    for name, value in headers.items():
+        name, value = name.encode('utf-8'), value.encode('utf-8')
+        encoded_headers += struct.pack('>B', len(name)) + name + b'\x07' + struct.pack('>H', len(value)) + value
+    total_length = 12 + len(encoded_headers) + len(payload) + 4
+    prelude = struct.pack('>II', total_length, len(encoded_headers))
+    prelude += struct.pack('>I', binascii.crc32(prelude) & 0xffffffff)
+    message = prelude + encoded_headers + payload
+    return message + struct.pack('>I', binascii.crc32(message) & 0xffffffff)
+
+def agent_chunk_event(text):
+    payload = json.dumps({'bytes': base64.b64encode(text.encode('utf-8')).decode('ascii')}).encode('utf-8')
+    return encode_event(
+        {':event-type': 'chunk', ':content-type': 'application/json', ':message-type': 'event'}, payload
+    )
+
+def stub_bedrock_agent_runtime(client, first_chunk_ms=50.0, chunks=5, chunk_bytes=200, chunk_interval_ms=10.0):
+    """InvokeAgent replies with `chunks` chunk events, the first after first_chunk_ms."""
+    def invoke_agent(request):
+        def frames():
+            time.sleep(first_chunk_ms / 1000)
+            for i in range(chunks):
+                if i and chunk_interval_ms:
+                    time.sleep(chunk_interval_ms / 1000)
+                text = f"[{i}] " + 'x' * max(0, chunk_bytes - 8) + "\n"
+                yield agent_chunk_event(text)
+        headers = {
+            'x-amzn-bedrock-agent-content-type': 'application/json',
+            'x-amz-bedrock-agent-session-id': 'benchmark-session',
+        }
+        return 200, headers, frames()
+    return stub_client(client, {'InvokeAgent': invoke_agent})
+
+# --- S3 ---
+
+def _etag():
+    return f'"{uuid.uuid4().hex}"'
+
+def stub_s3(client, request_ms=20.0, mb_per_second=100.0):
+    """Accepts PutObject and multipart uploads; lists an empty bucket."""
+    def put_object(request):
+        return 200, {'ETag': _etag()}, b''
+
+    def create_multipart_upload(request):
+        body = (
+            '<?xml version="1.0" encoding="UTF-8"?><InitiateMultipartUploadResult>'
+            f'<Bucket>bench</Bucket><Key>k</Key><UploadId>{uuid.uuid4().hex}</UploadId>'
+            '</InitiateMultipartUploadResult>'
+        )
+        return 200, {}, body.encode()
+
+    def complete_multipart_upload(request):
+        body = (
+            '<?xml version="1.0" encoding="UTF-8"?><CompleteMultipartUploadResult>'
+            f'<Bucket>bench</Bucket><Key>k</Key><ETag>{_etag()}</ETag>'
+            '</CompleteMultipartUploadResult>'
+        )
+        return 200, {}, body.encode()
+
+    def list_objects_v2(request):
+        body = (
+            '<?xml version="1.0" encoding="UTF-8"?><ListBucketResult>'
+            '<Name>bench</Name><KeyCount>0</KeyCount><IsTruncated>false</IsTruncated></ListBucketResult>'
+        )
+        return 200, {}, body.encode()
+
+    return stub_client(client, {
+        'PutObject': put_object,
+        'UploadPart': put_object,
+        'CreateMultipartUpload': create_multipart_upload,
+        'CompleteMultipartUpload': complete_multipart_upload,
+        'ListObjectsV2': list_objects_v2,
+    }, request_ms=request_ms, mb_per_second=mb_per_second)
+
+# --- Simulated time for setup.py ---
+
+class SimulatedClock:
+    """
+    Runs `speedup` times faster than real time. Threads still sleep for real
+    (scaled down), so parallel steps overlap exactly as they would live.
+    Install with `module.time = clock` on a module that does `import time`.
+    """
+
+    def __init__(self, speedup=200.0):
+        self.speedup = speedup
+        self._real_start = time.perf_counter()
+
+    def monotonic(self):
+        return (time.perf_counter() - self._real_start) * self.speedup
+
+    perf_counter = monotonic
+
+    def sleep(self, seconds):
+        time.sleep(max(0.0, seconds) / self.speedup)
+
+    def __getattr__(self, name):
+        # strftime, gmtime and anything else come from the real module
+        return getattr(time, name)
+
+# Simulated seconds per API call and for asynchronous state changes. These
+# are rough observed figures, not guarantees; change them to model slower
+# or faster regions.
+LATENCY_PROFILE = {
+    'iam_call': 0.4,
+    'role_propagation': 8.0, # until Lambda can assume a new role
+    'lambda_call': 0.2,
+    'lambda_create': 1.5,
+    'lambda_update': 1.5,
+    'lambda_update_settle': 3.0, # until function_updated succeeds
+    'agent_call': 0.3,
+    'agent_create': 4.0, # CREATING -> NOT_PREPARED
+    'agent_update': 2.0, # UPDATING -> NOT_PREPARED
+    'agent_prepare': 12.0, # PREPARING -> PREPARED
+    'alias_ready': 6.0, # CREATING/UPDATING -> PREPARED
+}
+
+class SimulatedError(Exception):
+    pass
+
+def _exceptions(*names):
+    return type('Exceptions', (), {name: type(name, (SimulatedError,), {}) for name in names})
+
+class SimulatedAccount:
+    """
+    In-memory IAM, Lambda and Bedrock Agent state for setup.py, with call
+    latencies and eventual consistency from LATENCY_PROFILE. `calls` counts
+    every API call by name.
+    """
+
+    def __init__(self, clock, profile=None):
+        self.clock = clock
+        self.profile = dict(LATENCY_PROFILE, **(profile or {}))
+        self.calls = {}
+        self._lock = threading.Lock()
+        self.roles = {}
+        self.functions = {}
+        self.agents = {}
+        self.iam = _Service(self, 'iam_call', _exceptions('EntityAlreadyExistsException'), {
+            'create_role': self._create_role, 'get_role': self._get_role,
+            'attach_role_policy': _nothing, 'put_role_policy': _nothing,
+        })
+        self.lambda_ = _Service(self, 'lambda_call', _exceptions('ResourceConflictException', 'InvalidParameterValueException'), {
+            'create_function': self._create_function,
+            'get_function_configuration': self._get_function_configuration,
+            'update_function_code': self._update_function_code,
+        }, waiters={'function_updated': self._wait_function_updated})
+        self.bedrock_agent = _Service(self, 'agent_call', _exceptions('ConflictException'), {
+            'create_agent': self._create_agent, 'list_agents': self._list_agents,
+            'get_agent': self._get_agent, 'update_agent': self._update_agent,
+            'create_agent_action_group': self._create_action_group,
+            'list_agent_action_groups': self._list_action_groups,
+            'get_agent_action_group': self._get_action_group,
+            'update_agent_action_group': self._update_action_group,
+            'prepare_agent': self._prepare_agent,
+            'list_agent_aliases': self._list_aliases, 'create_agent_alias': self._create_alias,
+            'update_agent_alias': self._update_alias, 'get_agent_alias': self._get_alias,
+        })
+
+    def count(self, name):
+        with self._lock:
+            self.calls[name] = self.calls.get(name, 0) + 1
+
+    def now(self):
+        return self.clock.monotonic()
+
+    # IAM
+    def _create_role(self, RoleName, **kwargs):
+        if RoleName in self.roles:
+            raise self.iam.exceptions.EntityAlreadyExistsException(RoleName)
+        arn = f"arn:aws:iam::123456789012:role/{RoleName}"
+        self.roles[RoleName] = {'Arn': arn, 'usable_at': self.now() + self.profile['role_propagation']}
+        return {'Role': {'Arn': arn}}
+
+    def _get_role(self, RoleName):
+        return {'Role': {'Arn': self.roles[RoleName]['Arn']}}
+
+    def _role_usable(self, arn):
+        role = next((r for r in self.roles.values() if r['Arn'] == arn), None)
+        return role is None or self.now() >= role['usable_at']
+
+    # Lambda
+    def _create_function(self, FunctionName, Role, Code, **kwargs):
+        self.clock.sleep(self.profile['lambda_create'])
+        if FunctionName in self.functions:
+            raise self.lambda_.exceptions.ResourceConflictException(FunctionName)
+        if not self._role_usable(Role):
+            raise self.lambda_.exceptions.InvalidParameterValueException(
+                "The role defined for the function cannot be assumed by Lambda."
+            )
+        arn = f"arn:aws:lambda:us-east-1:123456789012:function:{FunctionName}"
+        self.functions[FunctionName] = {'arn': arn, 'sha': _code_sha(Code['ZipFile']), 'settled_at': self.now()}
+        return {'FunctionArn': arn, 'Version': '1'}
+
+    def _get_function_configuration(self, FunctionName):
+        function = self.functions[FunctionName]
+        return {'FunctionArn': function['arn'], 'CodeSha256': function['sha']}
+
+    def _update_function_code(self, FunctionName, ZipFile, **kwargs):
+        self.clock.sleep(self.profile['lambda_update'])
+        function = self.functions[FunctionName]
+        function.update(sha=_code_sha(ZipFile), settled_at=self.now() + self.profile['lambda_update_settle'])
+        return {}
+
+    def _wait_function_updated(self, FunctionName, **kwargs):
+        # botocore's waiter polls every 5 s
+        while self.now() < self.functions[FunctionName]['settled_at']:
+            self.count('get_function (waiter)')
+            self.clock.sleep(5)
+
+    # Bedrock Agent
+    def _create_agent(self, agentName, **kwargs):
+        if any(a['agentName'] == agentName for a in self.agents.values()):
+            raise self.bedrock_agent.exceptions.ConflictException(agentName)
+        agent_id = uuid.uuid4().hex[:10].upper()
+        self.agents[agent_id] = dict(
+            kwargs, agentId=agent_id, agentName=agentName, status='CREATING',
+            ready_at=self.now() + self.profile['agent_create'], next_status='NOT_PREPARED',
+            action_groups={}, aliases={},
+        )
+        return {'agent': self._agent_view(agent_id)}
+
+    def _agent_view(self, agent_id):
+        agent = self.agents[agent_id]
+        if agent['status'] != agent['next_status'] and self.now() >= agent['ready_at']:
+            agent['status'] = agent['next_status']
+        view = {k: v for k, v in agent.items() if k not in ('status', 'ready_at', 'next_status', 'action_groups', 'aliases')}
+        return dict(view, agentStatus=agent['status'])
+
+    def _list_agents(self):
+        return {'agentSummaries': [{'agentId': a['agentId'], 'agentName': a['agentName']} for a in self.agents.values()]}
+
+    def _get_agent(self, agentId):
+        return {'agent': self._agent_view(agentId)}
+
+    def _require_settled(self, agent_id):
+        # Bedrock rejects changes while the agent is CREATING, UPDATING or PREPARING
+        status = self._agent_view(agent_id)['agentStatus']
+        if status in ('CREATING', 'UPDATING', 'PREPARING'):
+            raise self.bedrock_agent.exceptions.ConflictException(f"Agent {agent_id} is {status}")
+
+    def _update_agent(self, agentId, **kwargs):
+        self._require_settled(agentId)
+        agent = self.agents[agentId]
+        agent.update(kwargs, status='UPDATING', next_status='NOT_PREPARED',
+                     ready_at=self.now() + self.profile['agent_update'])
+        return {'agent': self._agent_view(agentId)}
+
+    def _create_action_group(self, agentId, actionGroupName, actionGroupExecutor, functionSchema, **kwargs):
+        self._require_settled(agentId)
+        groups = self.agents[agentId]['action_groups']
+        if any(g['actionGroupName'] == actionGroupName for g in groups.values()):
+            raise self.bedrock_agent.exceptions.ConflictException(actionGroupName)
+        group_id = uuid.uuid4().hex[:10].upper()
+        groups[group_id] = {'actionGroupId': group_id, 'actionGroupName': actionGroupName,
+                            'actionGroupExecutor': actionGroupExecutor, 'functionSchema': functionSchema}
+        return {'agentActionGroup': groups[group_id]}
+
+    def _list_action_groups(self, agentId, **kwargs):
+        return {'actionGroupSummaries': list(self.agents[agentId]['action_groups'].values())}
+
+    def _get_action_group(self, agentId, actionGroupId, **kwargs):
+        return {'agentActionGroup': self.agents[agentId]['action_groups'][actionGroupId]}
+
+    def _update_action_group(self, agentId, actionGroupId, actionGroupExecutor, functionSchema, **kwargs):
+        self._require_settled(agentId)
+        self.agents[agentId]['action_groups'][actionGroupId].update(
+            actionGroupExecutor=actionGroupExecutor, functionSchema=functionSchema
+        )
+        return {}
+
+    def _prepare_agent(self, agentId):
+        self._require_settled(agentId)
+        self.agents[agentId].update(
+            status='PREPARING', next_status='PREPARED', ready_at=self.now() + self.profile['agent_prepare']
+        )
+        return {'agentStatus': 'PREPARING'}
+
+    def _alias_view(self, agent_id, alias_id):
+        alias = self.agents[agent_id]['aliases'][alias_id]
+        status = 'PREPARED' if self.now() >= alias['ready_at'] else 'UPDATING'
+        return {'agentAliasId': alias_id, 'agentAliasName': alias['agentAliasName'], 'agentAliasStatus': status}
+
+    def _list_aliases(self, agentId):
+        aliases = self.agents[agentId]['aliases']
+        return {'agentAliasSummaries': [self._alias_view(agentId, alias_id) for alias_id in aliases]}
+
+    def _create_alias(self, agentId, agentAliasName):
+        alias_id = uuid.uuid4().hex[:10].upper()
+        self.agents[agentId]['aliases'][alias_id] = {
+            'agentAliasName': agentAliasName, 'ready_at': self.now() + self.profile['alias_ready'],
+        }
+        return {'agentAlias': self._alias_view(agentId, alias_id)}
+
+    def _update_alias(self, agentId, agentAliasId, **kwargs):
+        self.agents[agentId]['aliases'][agentAliasId]['ready_at'] = self.now() + self.profile['alias_ready']
+        return {}
+
+    def _get_alias(self, agentId, agentAliasId):
+        return {'agentAlias': self._alias_view(agentId, agentAliasId)}
+
+def _nothing(**kwargs):
+    return {}
+
+def _code_sha(zip_bytes):
+    return base64.b64encode(hashlib.sha256(zip_bytes).digest()).decode()
+
+class _Waiter:
+    def __init__(self, fn):
+        self._fn = fn
+
+    def wait(self, **kwargs):
+        self._fn(**kwargs)
+
+class _Service:
+    """A fake boto3 client: each call counts, waits its latency, then runs."""
+
+    def __init__(self, account, latency_key, exceptions, operations, waiters=None):
+        self._account = account
+        self._latency_key = latency_key
+        self.exceptions = exceptions
+        self._operations = operations
+        self._waiters = waiters or {}
+
+    def get_waiter(self, name):
+        return _Waiter(self._waiters[name])
+
+    def __getattr__(self, name):
+        operation = self._operations.get(name)
+        if operation is None:
+            raise AttributeError(name)
+
+        def call(**kwargs):
+            self._account.count(name)
+            self._account.clock.sleep(self._account.profile[self._latency_key])
+            return operation(**kwargs)
+        return call
@@ -0,0 +1,153 @@
+# benchmarks/lambda_cold_warm.py
+# Measures cold and warm invocation time of the action-group Lambda
+# (backend/lambda_function.py) locally, without touching AWS.
+#
+# AWS calls are stubbed at the botocore 'before-send' hook, so every call
+# still goes through parameter validation, serialization and response
+# parsing, exactly like in Lambda, but the HTTP request never leaves the
+# process.
+#
+# Usage (from the project root):
+#   python benchmarks/lambda_cold_warm.py [--cold-runs 5] [--warm-calls 200]
+#
+# The idempotency cache is disabled by default so every warm call really
+# goes through botocore; pass --with-cache to measure cached repeats.
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'backend')
+
+# Canned bodies for the operations the tools call. Anything not listed
+# gets an empty 200 response, which botocore parses as an empty result.
+STUB_BODIES = {
+    'CreateFunction': b'{"FunctionArn": "arn:aws:lambda:us-east-1:123456789012:function:stub"}',
+}
+
+def make_event(function, **parameters):
+    return {
+        'messageVersion': '1.0',
+        'actionGroup': 'CloudCraftTools',
+        'function': function,
+        'parameters': [{'name': k, 'type': 'string', 'value': v} for k, v in parameters.items()],
+    }
+
+EVENTS = {
+    'create_s3_bucket': make_event('create_s3_bucket', bucket_name='bench-bucket', region='us-east-1'),
+    'deploy_static_site': make_event('deploy_static_site', bucket_name='bench-bucket'),
+    'create_hello_world_lambda': make_event(
+        'create_hello_world_lambda', function_name='bench-fn',
+        role_arn='arn:aws:iam::123456789012:role/bench'
+    ),
+}
+
+def install_stubs():
+    """Short-circuits every AWS HTTP request made through the boto3 session."""
+    import boto3
+    from botocore.awsrequest import AWSResponse
+
+    class _Raw:
+        def __init__(self, body):
+            self._body = body
+
+        def stream(self, **kwargs):
+            yield self._body
+
+        def read(self, *args, **kwargs):
+            return self._body
+
+    def respond(request, **kwargs):
+        operation = kwargs.get('event_name', '').rsplit('.', 1)[-1]
+        body = STUB_BODIES.get(operation, b'')
+        return AWSResponse(request.url, 200, {}, _Raw(body))
+
+    os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+    os.environ.setdefault('AWS_ACCESS_KEY_ID', 'bench')
+    os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'bench')
+    boto3.setup_default_session()
+    boto3.DEFAULT_SESSION.events.register('before-send', respond)
+
+def child(function):
+    """One cold start: import the module and invoke it twice in a fresh interpreter."""
+    started_at = time.perf_counter()
+    install_stubs()
+    stubs_ready_at = time.perf_counter()
+    sys.path.insert(0, BACKEND_DIR)
+    import io
+    import contextlib
+    with contextlib.redirect_stdout(io.StringIO()):
+        import lambda_function
+        imported_at = time.perf_counter()
+        lambda_function.lambda_handler(EVENTS[function], None)
+        first_call_at = time.perf_counter()
+        lambda_function.lambda_handler(EVENTS[function], None)
+        second_call_at = time.perf_counter()
+    print(json.dumps({
+        'boto3ImportMs': (stubs_ready_at - started_at) * 1000,
+        'moduleInitMs': lambda_function.INIT_DURATION_MS,
+        'importMs': (imported_at - stubs_ready_at) * 1000,
+        'firstCallMs': (first_call_at - imported_at) * 1000,
+        'secondCallMs': (second_call_at - first_call_at) * 1000,
+    }))
+
+def measure_cold(function, runs, with_cache=False):
+    samples = []
+    extra = ['--with-cache'] if with_cache else []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--child', function] + extra,
+            check=True, capture_output=True, text=True
+        ).stdout
+        samples.append(json.loads(output.strip().splitlines()[-1]))
+    return {key: round(statistics.median(s[key] for s in samples), 2) for key in samples[0]}
+
+def measure_warm(function, calls):
+    import io
+    import contextlib
+    install_stubs()
+    sys.path.insert(0, BACKEND_DIR)
+    import lambda_function
+    durations = []
+    with contextlib.redirect_stdout(io.StringIO()):
+        lambda_function.lambda_handler(EVENTS[function], None) # warm up
+        for _ in range(calls):
+            started_at = time.perf_counter()
+            lambda_function.lambda_handler(EVENTS[function], None)
+            durations.append((time.perf_counter() - started_at) * 1000)
+    durations.sort()
+    return {
+        'calls': calls,
+        'p50Ms': round(durations[len(durations) // 2], 3),
+        'p95Ms': round(durations[int(len(durations) * 0.95) - 1], 3),
+        'meanMs': round(statistics.fmean(durations), 3),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--cold-runs', type=int, default=5)
+    parser.add_argument('--warm-calls', type=int, default=200)
+    parser.add_argument('--function', choices=sorted(EVENTS), default='deploy_static_site')
+    parser.add_argument('--with-cache', action='store_true', help='keep the idempotency cache enabled')
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if not args.with_cache:
+        # Read by lambda_function at import time
+        os.environ['IDEMPOTENCY_TTL_SECONDS'] = '0'
+
+    if args.child:
+        child(args.child)
+        return
+
+    results = {
+        'function': args.function,
+        'cold': measure_cold(args.function, args.cold_runs, args.with_cache),
+        'warm': measure_warm(args.function, args.warm_calls),
+    }
+    print(json.dumps(results, indent=2))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,232 @@
+# benchmarks/load_test.py
+# Load test for the backend served the production way (backend/serve.py),
+# without touching AWS.
+#
+# The app's Bedrock and S3 clients are replaced by local stand-ins with a
+# configurable latency, the server runs in this process on a free port, and
+# --sessions client threads (each with its own keep-alive connection) send
+# a mix of streamed agent prompts, buffered agent prompts and small file
+# uploads for --duration seconds. A 429 is counted separately from errors
+# and the session backs off for the Retry-After time.
+#
+# Usage (from the project root):
+#   python benchmarks/load_test.py [--sessions 60] [--duration 10] [--server waitress|werkzeug]
+import argparse
+import http.client
+import json
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Share of each request type in the mix
+MIX = [('agent_stream', 0.5), ('agent', 0.3), ('upload', 0.2)]
+
+class FakeBedrockAgentRuntime:
+    """Answers invoke_agent with a chunk stream after a fixed delay."""
+
+    def __init__(self, first_chunk_ms, chunks, chunk_interval_ms):
+        self.first_chunk = first_chunk_ms / 1000
+        self.chunks = chunks
+        self.chunk_interval = chunk_interval_ms / 1000
+
+    def invoke_agent(self, **kwargs):
+        def completion():
+            time.sleep(self.first_chunk)
+            for i in range(self.chunks):
+                if i:
+                    time.sleep(self.chunk_interval)
+                yield {'chunk': {'bytes': f"Part {i} of the answer to {kwargs['inputText']!r}. ".encode('utf-8')}}
+        return {'completion': completion()}
+
+class FakeS3:
+    """Accepts uploads after a per-request latency plus a bandwidth delay."""
+
+    def __init__(self, request_ms, mb_per_second):
+        self.request = request_ms / 1000
+        self.bytes_per_second = mb_per_second * 1024 * 1024
+
+    def upload_fileobj(self, fileobj, bucket, key, ExtraArgs=None, Config=None):
+        size = len(fileobj.read())
+        time.sleep(self.request + size / self.bytes_per_second)
+
+def start_server(kind, app):
+    """Starts the app on a free local port. Returns (port, stop function)."""
+    if kind == 'waitress':
+        from waitress import create_server
+        from backend.serve import server_options
+        server = create_server(app, host='127.0.0.1', port=0, **server_options())
+        port = server.effective_port
+        threading.Thread(target=server.run, daemon=True).start()
+
+        def stop():
+            server.task_dispatcher.shutdown(timeout=5)
+            server.close()
+        return port, stop
+    from werkzeug.serving import make_server
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server.server_port, server.shutdown
+
+def multipart_body(fields, files):
+    boundary = uuid.uuid4().hex
+    parts = []
+    for name, value in fields.items():
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode())
+    for filename, data in files:
+        parts.append(
+            f'--{boundary}\r\nContent-Disposition: form-data; name="files"; filename="{filename}"\r\n'
+            f'Content-Type: application/octet-stream\r\n\r\n'.encode() + data + b'\r\n'
+        )
+    parts.append(f'--{boundary}--\r\n'.encode())
+    return b''.join(parts), f'multipart/form-data; boundary={boundary}'
+
+class Session(threading.Thread):
+    """One simulated user sending requests back to back until the deadline."""
+
+    def __init__(self, index, port, deadline, files, file_size, samples, lock):
+        super().__init__(daemon=True)
+        self.index = index
+        self.port = port
+        self.deadline = deadline
+        self.upload = multipart_body(
+            {'bucketName': 'load-test-bucket'},
+            [(f'site/page-{n}.html', os.urandom(file_size)) for n in range(files)]
+        )
+        self.samples = samples
+        self.lock = lock
+        self.random = random.Random(index)
+
+    def request(self, conn, kind):
+        if kind == 'upload':
+            body, content_type = self.upload
+            conn.request('POST', '/upload-files', body=body, headers={'Content-Type': content_type})
+        else:
+            body = json.dumps({
+                'prompt': f'Hello from session {self.index}',
+                'sessionId': f'load-{self.index}',
+                'stream': kind == 'agent_stream',
+            })
+            conn.request('POST', '/invoke-agent', body=body, headers={'Content-Type': 'application/json'})
+        response = conn.getresponse()
+        first_byte = None
+        while True:
+            data = response.read1(65536)
+            if not data:
+                break
+            if first_byte is None:
+                first_byte = time.perf_counter()
+        response.read() # marks the response closed so the connection can be reused
+        return response.status, response.getheader('Retry-After'), first_byte
+
+    def run(self):
+        conn = http.client.HTTPConnection('127.0.0.1', self.port, timeout=60)
+        kinds, weights = zip(*MIX)
+        while time.perf_counter() < self.deadline:
+            kind = self.random.choices(kinds, weights)[0]
+            started_at = time.perf_counter()
+            try:
+                status, retry_after, first_byte = self.request(conn, kind)
+            except (OSError, http.client.HTTPException):
+                conn.close()
+                conn = http.client.HTTPConnection('127.0.0.1', self.port, timeout=60)
+                status, retry_after, first_byte = None, None, None
+            finished_at = time.perf_counter()
+            with self.lock:
+                self.samples.append((kind, status, finished_at - started_at,
+                                     first_byte - started_at if first_byte else None, finished_at))
+            if status == 429:
+                # Back off like a well-behaved client, with jitter
+                time.sleep(float(retry_after or 1) * self.random.uniform(0.5, 1.0))
+        conn.close()
+
+def percentile(values, p):
+    if not values:
+        return None
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(len(values) * p))] * 1000, 1)
+
+def report(samples, seconds):
+    groups = {kind: [s for s in samples if s[0] == kind] for kind, _ in MIX}
+    groups['all'] = samples
+    result = {}
+    for kind, group in groups.items():
+        ok = [s for s in group if s[1] == 200]
+        entry = {
+            'requests': len(group),
+            'ok': len(ok),
+            'rejected429': sum(1 for s in group if s[1] == 429),
+            'errors': sum(1 for s in group if s[1] not in (200, 429)),
+            'okPerSecond': round(len(ok) / seconds, 1),
+            'p50Ms': percentile([s[2] for s in ok], 0.50),
+            'p95Ms': percentile([s[2] for s in ok], 0.95),
+            'p99Ms': percentile([s[2] for s in ok], 0.99),
+        }
+        if kind == 'agent_stream':
+            entry['ttfbP50Ms'] = percentile([s[3] for s in ok if s[3] is not None], 0.50)
+            entry['ttfbP99Ms'] = percentile([s[3] for s in ok if s[3] is not None], 0.99)
+        result[kind] = entry
+    return result
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the backend against local Bedrock/S3 stand-ins.")
+    parser.add_argument('--sessions', type=int, default=60)
+    parser.add_argument('--duration', type=float, default=10.0, help='seconds of load')
+    parser.add_argument('--server', choices=['waitress', 'werkzeug'], default='waitress')
+    parser.add_argument('--agent-first-chunk-ms', type=float, default=300)
+    parser.add_argument('--agent-chunks', type=int, default=5)
+    parser.add_argument('--agent-chunk-interval-ms', type=float, default=50)
+    parser.add_argument('--s3-request-ms', type=float, default=30)
+    parser.add_argument('--s3-mb-per-second', type=float, default=50)
+    parser.add_argument('--upload-files', type=int, default=10, help='files per upload request')
+    parser.add_argument('--upload-file-kb', type=int, default=64)
+    args = parser.parse_args()
+
+    os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+    os.environ.setdefault('AWS_ACCESS_KEY_ID', 'load-test')
+    os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'load-test')
+    import contextlib
+    import io
+    import logging
+    # waitress logs a warning whenever requests queue for a thread, which is
+    # expected at this load
+    logging.getLogger('waitress.queue').setLevel(logging.ERROR)
+    from backend import app as app_module
+    app_module.bedrock_agent_runtime_client = FakeBedrockAgentRuntime(
+        args.agent_first_chunk_ms, args.agent_chunks, args.agent_chunk_interval_ms
+    )
+    app_module.s3_client = FakeS3(args.s3_request_ms, args.s3_mb_per_second)
+
+    port, stop = start_server(args.server, app_module.app)
+    samples = []
+    lock = threading.Lock()
+    # Silence the app's per-request prints so they don't skew the numbers
+    with contextlib.redirect_stdout(io.StringIO()):
+        started_at = time.perf_counter()
+        deadline = started_at + args.duration
+        sessions = [
+            Session(i, port, deadline, args.upload_files, args.upload_file_kb * 1024, samples, lock)
+            for i in range(args.sessions)
+        ]
+        for session in sessions:
+            session.start()
+        for session in sessions:
+            session.join()
+        seconds = time.perf_counter() - started_at
+        limits = app_module.limits_snapshot()
+    stop()
+
+    print(json.dumps({
+        'server': args.server,
+        'sessions': args.sessions,
+        'seconds': round(seconds, 2),
+        'results': report(samples, seconds),
+        'limits': limits,
+    }, indent=2))
+
+if __name__ == '__main__':
+    main()
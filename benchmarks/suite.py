@@ -0,0 +1,375 @@
+# benchmarks/suite.py
+# Offline benchmark suite. Nothing here talks to AWS: every service is a
+# local stand-in from aws_standins.py.
+#
+#   invoke_agent    /invoke-agent, buffered and streamed: time to first
+#                   chunk, total time, and peak memory for a large reply
+#   handle_upload   /upload-files: files/s and MB/s for several file-count
+#                   and size mixes, plus the optimize=true asset pipeline
+#   lambda_handler  per-call overhead of the action group Lambda, cold and
+#                   warm (runs lambda_cold_warm.py)
+#   setup           setup.py end to end, full and incremental, under a
+#                   simulated clock with realistic AWS latencies
+#
+# Every benchmark runs in its own interpreter. Results are written as JSON;
+# compare two runs to find regressions between versions:
+#
+#   python benchmarks/suite.py --output results.json [--quick] [--only setup,invoke_agent]
+#   python benchmarks/suite.py --compare baseline.json --output results.json
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, ROOT_DIR)
+sys.path.insert(0, BENCH_DIR)
+
+BENCHMARKS = ['invoke_agent', 'handle_upload', 'lambda_handler', 'setup']
+# Results format version; bump it when metric names change
+SCHEMA_VERSION = 1
+# Changes smaller than this (in the metric's own unit) are timer noise, not regressions
+NOISE_FLOOR = 1.0
+
+def _offline_environment():
+    os.environ.setdefault('AWS_DEFAULT_REGION', 'us-east-1')
+    os.environ.setdefault('AWS_ACCESS_KEY_ID', 'benchmark')
+    os.environ.setdefault('AWS_SECRET_ACCESS_KEY', 'benchmark')
+
+def _ms(seconds):
+    return round(seconds * 1000, 3)
+
+def _summary(samples_ms):
+    samples_ms = sorted(samples_ms)
+    return {
+        'p50Ms': round(samples_ms[len(samples_ms) // 2], 3),
+        'p95Ms': round(samples_ms[min(len(samples_ms) - 1, int(len(samples_ms) * 0.95))], 3),
+        'meanMs': round(statistics.fmean(samples_ms), 3),
+    }
+
+def _import_app():
+    _offline_environment()
+    with contextlib.redirect_stdout(io.StringIO()):
+        from backend import app as app_module
+    return app_module
+
+# --- invoke_agent ---
+
+AGENT_SCENARIOS = {
+    # name: (first chunk ms, chunks, bytes per chunk, ms between chunks)
+    'typical': (50.0, 20, 200, 5.0),
+    'large': (0.0, 2000, 4096, 0.0),
+}
+
+def _agent_request(client, stream):
+    """Returns (seconds to first body byte, total seconds, body bytes)."""
+    started_at = time.perf_counter()
+    response = client.post('/invoke-agent', json={
+        'prompt': 'Summarize what you can do', 'sessionId': 'benchmark-session', 'stream': stream,
+    }, buffered=False)
+    first_byte = None
+    size = 0
+    for data in response.response:
+        if data and first_byte is None:
+            first_byte = time.perf_counter()
+        size += len(data)
+    response.close()
+    finished_at = time.perf_counter()
+    if response.status_code != 200:
+        raise RuntimeError(f"/invoke-agent returned {response.status_code}")
+    return first_byte - started_at, finished_at - started_at, size
+
+def bench_invoke_agent(quick):
+    from aws_standins import stub_bedrock_agent_runtime
+    app_module = _import_app()
+    client = app_module.app.test_client()
+    results = {}
+    for name, (first_chunk_ms, chunks, chunk_bytes, interval_ms) in AGENT_SCENARIOS.items():
+        stub_bedrock_agent_runtime(app_module.bedrock_agent_runtime_client, first_chunk_ms, chunks, chunk_bytes, interval_ms)
+        runs = (3 if quick else 10) if name == 'large' else (10 if quick else 40)
+        scenario = {'firstChunkDelayMs': first_chunk_ms, 'chunks': chunks, 'replyBytes': chunks * chunk_bytes}
+        with contextlib.redirect_stdout(io.StringIO()):
+            for mode, stream in (('buffered', False), ('streamed', True)):
+                _agent_request(client, stream) # warm up
+                ttfb, total = [], []
+                for _ in range(runs):
+                    first, whole, _ = _agent_request(client, stream)
+                    ttfb.append(_ms(first))
+                    total.append(_ms(whole))
+                tracemalloc.start()
+                _agent_request(client, stream)
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+                scenario[mode] = {
+                    'runs': runs,
+                    'timeToFirstByte': _summary(ttfb),
+                    'total': _summary(total),
+                    'peakMemoryKiB': round(peak / 1024, 1),
+                }
+        # Time the app adds on top of the stand-in's own first-chunk delay
+        scenario['streamed']['firstChunkOverheadMs'] = round(
+            scenario['streamed']['timeToFirstByte']['p50Ms'] - first_chunk_ms, 3
+        )
+        results[name] = scenario
+    return results
+
+# --- handle_upload ---
+
+UPLOAD_MIXES = {
+    # name: (file count, bytes per file, extra form fields)
+    'many_small': (200, 4 * 1024, {}),
+    'medium': (40, 256 * 1024, {}),
+    'large': (2, 24 * 1024 * 1024, {}),
+    'site_optimized': (60, 24 * 1024, {'optimize': 'true'}),
+}
+S3_REQUEST_MS = 15.0
+S3_MB_PER_SECOND = 100.0
+
+def _site_file(index, size):
+    """Text files that reference each other, for the asset pipeline."""
+    if index == 0:
+        links = ''.join(f'<link rel="stylesheet" href="css/style{i}.css">' for i in range(1, 20))
+        return 'index.html', (f'<html><head>{links}</head><body>' + 'Hello ' * (size // 6) + '</body></html>').encode()
+    if index < 20:
+        return f'css/style{index}.css', (f'.c{index} {{ color: #333; margin: 0 auto; }}\n' * (size // 40)).encode()
+    return f'js/app{index}.js', (f'function f{index}(a, b) {{ return a + b; }}\n' * (size // 42)).encode()
+
+def _upload_form(count, size, fields):
+    files = []
+    for i in range(count):
+        if fields.get('optimize'):
+            name, data = _site_file(i, size)
+        else:
+            name, data = f'file-{i:04d}.bin', os.urandom(size)
+        files.append((name, data))
+    return files
+
+def bench_handle_upload(quick):
+    from aws_standins import stub_s3
+    app_module = _import_app()
+    stub_s3(app_module.s3_client, request_ms=S3_REQUEST_MS, mb_per_second=S3_MB_PER_SECOND)
+    client = app_module.app.test_client()
+    results = {'s3RequestMs': S3_REQUEST_MS, 's3MbPerSecond': S3_MB_PER_SECOND}
+    for name, (count, size, fields) in UPLOAD_MIXES.items():
+        files = _upload_form(count, size, fields)
+        runs = 2 if quick else 5
+        seconds = []
+        server_stats = None
+        with contextlib.redirect_stdout(io.StringIO()):
+            for _ in range(runs + 1): # the first run warms up
+                data = dict(fields, bucketName='benchmark-bucket')
+                data['files'] = [(io.BytesIO(content), filename) for filename, content in files]
+                started_at = time.perf_counter()
+                response = client.post('/upload-files', data=data, content_type='multipart/form-data')
+                seconds.append(time.perf_counter() - started_at)
+                if response.status_code != 200:
+                    raise RuntimeError(f"/upload-files returned {response.status_code}: {response.get_json()}")
+                server_stats = response.get_json()
+        best = statistics.median(seconds[1:])
+        total_bytes = sum(len(content) for _, content in files)
+        results[name] = {
+            'files': count,
+            'bytes': total_bytes,
+            'runs': runs,
+            'requestMs': _ms(best),
+            'filesPerSecond': round(count / best, 1),
+            'mbPerSecond': round(total_bytes / (1024 * 1024) / best, 2),
+        }
+        if 'assets' in server_stats:
+            results[name]['assets'] = server_stats['assets']
+    return results
+
+# --- lambda_handler ---
+
+LAMBDA_FUNCTIONS = ['create_s3_bucket', 'deploy_static_site', 'create_hello_world_lambda']
+
+def bench_lambda_handler(quick):
+    results = {}
+    for function in LAMBDA_FUNCTIONS:
+        output = subprocess.run(
+            [sys.executable, os.path.join(BENCH_DIR, 'lambda_cold_warm.py'), '--function', function,
+             '--cold-runs', '2' if quick else '5', '--warm-calls', '50' if quick else '300'],
+            check=True, capture_output=True, text=True, cwd=ROOT_DIR,
+        ).stdout
+        measured = json.loads(output)
+        results[function] = {'cold': measured['cold'], 'warm': measured['warm']}
+    return results
+
+# --- setup ---
+
+SETUP_SPEEDUP = 200.0
+
+def _run_setup(setup, graph):
+    clock = setup.time
+    started_at, real_started_at = clock.monotonic(), time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        results, timings = setup.run_graph(graph)
+    return results, {
+        'simulatedSeconds': round(clock.monotonic() - started_at, 2),
+        'realSeconds': round(time.perf_counter() - real_started_at, 3),
+        'steps': {
+            name: {'startAt': round(start, 2), 'seconds': round(duration, 2)}
+            for name, (start, duration) in sorted(timings.items(), key=lambda item: item[1][0])
+        },
+    }
+
+def bench_setup(quick):
+    from aws_standins import SimulatedAccount, SimulatedClock
+    _offline_environment()
+    import setup
+    clock = SimulatedClock(SETUP_SPEEDUP)
+    account = SimulatedAccount(clock)
+    setup.time = clock
+    setup.random.seed(0)
+    setup.iam_client = account.iam
+    setup.lambda_client = account.lambda_
+    setup.bedrock_agent_client = account.bedrock_agent
+
+    package = setup.build_lambda_package()
+    results = {'speedup': SETUP_SPEEDUP}
+
+    def scenario(name, graph):
+        calls_before = sum(account.calls.values())
+        step_results, report = _run_setup(setup, graph)
+        report['apiCalls'] = sum(account.calls.values()) - calls_before
+        results[name] = report
+        return step_results
+
+    full = scenario('full', setup.provisioning_steps(package))
+    agent_id = full['agent']
+    state = {'agentId': agent_id, 'actionGroupId': full['action_group'], 'agentAliasId': full['alias']}
+
+    scenario('incremental_unchanged', setup.reprovisioning_steps(package, state))
+
+    # Deployed code differs from the local package
+    account.functions[setup.LAMBDA_FUNCTION_NAME]['sha'] = 'previous-version'
+    scenario('incremental_code_change', setup.reprovisioning_steps(package, state))
+
+    # Deployed action group misses a tool, so the agent must be re-prepared
+    group = account.agents[agent_id]['action_groups'][state['actionGroupId']]
+    group['functionSchema'] = {'functions': group['functionSchema']['functions'][:-1]}
+    scenario('incremental_schema_change', setup.reprovisioning_steps(package, state))
+
+    # Instructions and schema both changed: the action group update must wait
+    # until UpdateAgent's UPDATING status has settled
+    account.agents[agent_id]['instruction'] = 'Previous instructions.'
+    group['functionSchema'] = {'functions': group['functionSchema']['functions'][:-1]}
+    scenario('incremental_config_change', setup.reprovisioning_steps(package, state))
+    return results
+
+# --- Runner ---
+
+def run_child(name, quick):
+    """Runs one benchmark in this process and prints its JSON result."""
+    result = globals()[f'bench_{name}'](quick)
+    print(json.dumps(result))
+
+def run_benchmark(name, quick):
+    command = [sys.executable, os.path.abspath(__file__), '--bench', name] + (['--quick'] if quick else [])
+    completed = subprocess.run(command, capture_output=True, text=True, cwd=ROOT_DIR)
+    if completed.returncode != 0:
+        return {'error': completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else 'failed'}
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+def environment():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                cwd=ROOT_DIR).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        'commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+        'createdAt': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+    }
+
+def flatten(value, prefix=''):
+    """{'a': {'b': 1}} -> {'a.b': 1} for numeric leaves."""
+    if isinstance(value, dict):
+        flat = {}
+        for key, item in value.items():
+            flat.update(flatten(item, f"{prefix}{key}."))
+        return flat
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return {prefix[:-1]: value}
+    return {}
+
+def direction(metric):
+    """-1 if lower is better, 1 if higher is better, 0 if not a performance metric."""
+    leaf = metric.rsplit('.', 1)[-1].lower()
+    if leaf.endswith('persecond'):
+        return 1
+    if leaf.endswith(('ms', 'seconds', 'kib')) and leaf not in ('firstchunkdelayms', 's3requestms'):
+        return -1
+    return 0
+
+def compare(baseline, current, tolerance):
+    """Prints metrics that got worse by more than `tolerance`. Returns their count."""
+    old = flatten(baseline.get('benchmarks', {}))
+    new = flatten(current.get('benchmarks', {}))
+    if baseline.get('quick') != current.get('quick'):
+        print("Warning: only one of the two runs used --quick; numbers may not be comparable.", file=sys.stderr)
+    regressions = []
+    for metric in sorted(old.keys() & new.keys()):
+        sign = direction(metric)
+        if sign == 0 or not old[metric]:
+            continue
+        change = (new[metric] - old[metric]) / abs(old[metric])
+        if -sign * change > tolerance and abs(new[metric] - old[metric]) >= NOISE_FLOOR:
+            regressions.append((metric, old[metric], new[metric], change))
+    print(f"Compared with {baseline.get('environment', {}).get('commit')}: {len(regressions)} regression(s) "
+          f"beyond {tolerance:.0%}", file=sys.stderr)
+    for metric, before, after, change in regressions:
+        print(f"  {metric}: {before} -> {after} ({change:+.1%})", file=sys.stderr)
+    return len(regressions)
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmark suite for CloudCraft.")
+    parser.add_argument('--only', help=f"comma-separated subset of: {', '.join(BENCHMARKS)}")
+    parser.add_argument('--quick', action='store_true', help='fewer runs, for a fast smoke test')
+    parser.add_argument('--output', help='write the JSON results to this file')
+    parser.add_argument('--compare', help='baseline results file to check for regressions')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='allowed relative slowdown (default 0.2)')
+    parser.add_argument('--bench', choices=BENCHMARKS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.bench:
+        run_child(args.bench, args.quick)
+        return
+
+    names = args.only.split(',') if args.only else BENCHMARKS
+    unknown = [name for name in names if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmark(s): {', '.join(unknown)}")
+
+    results = {'schema': SCHEMA_VERSION, 'environment': environment(), 'quick': args.quick, 'benchmarks': {}}
+    for name in names:
+        print(f"Running {name}...", file=sys.stderr)
+        started_at = time.perf_counter()
+        results['benchmarks'][name] = run_benchmark(name, args.quick)
+        print(f"  done in {time.perf_counter() - started_at:.1f}s", file=sys.stderr)
+
+    output = json.dumps(results, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + "\n")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if compare(baseline, results, args.tolerance):
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
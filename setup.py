@@ -1,8 +1,16 @@
 # setup.py (Corrected Version)
+import argparse
+import base64
 import boto3
+import hashlib
 import json
+import os
+import random
+import threading
 import time
-import zipfile
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from backend.lambda_function import build_template_zip, function_schema
 
 # --- Configuration ---
 AGENT_NAME = "CloudCraftAgent-Automated"
@@ -10,6 +18,25 @@ LAMBDA_FUNCTION_NAME = "CloudCraftActionGroup-Automated"
 LAMBDA_ROLE_NAME = "CloudCraftLambdaRole-Automated"
 AGENT_ROLE_NAME = "CloudCraftAgentRole-Automated"
 REGION = "us-east-1"
+ACTION_GROUP_NAME = "CloudCraftTools"
+ALIAS_NAME = "TestAlias"
+FOUNDATION_MODEL = "anthropic.claude-3-sonnet-20240229-v1:0"
+
+# --- Files ---
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+# What was deployed last time (IDs and content hashes), for incremental runs
+STATE_FILE = os.path.join(BASE_DIR, '.cloudcraft_state.json')
+# Agent IDs read by backend/app.py at startup
+APP_CONFIG_FILE = os.path.join(BASE_DIR, 'backend', 'agent_config.json')
+# Files in the action group Lambda package: archive name -> source path
+LAMBDA_SOURCES = {'lambda_function.py': os.path.join(BASE_DIR, 'backend', 'lambda_function.py')}
+
+# --- Waiting ---
+# Readiness probes back off exponentially with jitter instead of sleeping a
+# fixed time, and every wait has a timeout.
+WAIT_INITIAL_DELAY = 1.0
+WAIT_MAX_DELAY = 15.0
+WAIT_TIMEOUT = 300.0
 
 # --- Agent Instructions ---
 AGENT_INSTRUCTIONS = """
@@ -17,7 +44,9 @@ You are CloudCraft Agent, an expert AWS DevOps assistant. Your purpose is to hel
 1. Analyze the user's request to understand their goal.
 2. If you need more information (like an IAM role ARN, which you cannot create yourself), you MUST ask the user for it. Do not guess or make up values.
 3. Create a multi-step plan to achieve the goal using the available tools.
-4. The sequence of operations is critical. For a static website, the order must be: create_s3_bucket, disable_s3_block_public_access, set_public_read_policy, and then configure_s3_static_hosting.
+4. For a static website, call deploy_static_site once. It runs all four setup steps (create_s3_bucket, disable_s3_block_public_access, set_public_read_policy, configure_s3_static_hosting) in order and reports each one. If it stops at a step, you may call it again with the same bucket name to resume.
+5. When the user wants several static sites or Lambda functions at once, call deploy_static_sites or create_hello_world_lambdas once with the full list of names instead of looping one resource per turn.
+6. Only use the individual S3 tools when the user asks for a single step. Their order is critical: create_s3_bucket, disable_s3_block_public_access, set_public_read_policy, and then configure_s3_static_hosting.
 """
 
 
@@ -35,13 +64,23 @@ def create_iam_role(role_name, trust_policy):
         response = iam_client.get_role(RoleName=role_name)
         return response['Role']['Arn']
 
-def create_lambda_function(role_arn):
-    """Packages and creates the Lambda function for the action group."""
-    print("Zipping Lambda function code...")
-    with zipfile.ZipFile('backend/lambda_function.zip', 'w') as z:
-        z.write('backend/lambda_function.py', arcname='lambda_function.py')
-    with open('backend/lambda_function.zip', 'rb') as f:
-        zip_bytes = f.read()
+def build_lambda_package():
+    """
+    Zips the Lambda sources deterministically (sorted entries, fixed
+    timestamps and permissions), so unchanged code always produces the same
+    archive. Returns (zip bytes, CodeSha256); the hash uses the same format
+    Lambda reports, so it can be compared with the deployed function.
+    """
+    sources = {}
+    for arcname, path in LAMBDA_SOURCES.items():
+        with open(path, 'rb') as f:
+            sources[arcname] = f.read()
+    zip_bytes = build_template_zip(sources)
+    return zip_bytes, base64.b64encode(hashlib.sha256(zip_bytes).digest()).decode()
+
+def create_lambda_function(role_arn, package):
+    """Creates the Lambda function for the action group, or updates its code if it exists."""
+    zip_bytes, code_sha256 = package
     print(f"Creating Lambda function '{LAMBDA_FUNCTION_NAME}'...")
     try:
         response = lambda_client.create_function(
@@ -51,9 +90,23 @@ def create_lambda_function(role_arn):
         )
         return response['FunctionArn']
     except lambda_client.exceptions.ResourceConflictException:
-        print(f"Lambda function '{LAMBDA_FUNCTION_NAME}' already exists. Skipping.")
-        account_id = boto3.client('sts').get_caller_identity()['Account']
-        return f"arn:aws:lambda:{REGION}:{account_id}:function:{LAMBDA_FUNCTION_NAME}"
+        print(f"Lambda function '{LAMBDA_FUNCTION_NAME}' already exists. Checking its code.")
+        function_arn, _ = update_lambda_code(package)
+        return function_arn
+
+def update_lambda_code(package):
+    """Uploads the package only if the deployed code differs. Returns (function ARN, changed)."""
+    zip_bytes, code_sha256 = package
+    config = lambda_client.get_function_configuration(FunctionName=LAMBDA_FUNCTION_NAME)
+    # Unqualified ARN, as used by the action group executor
+    function_arn = config['FunctionArn'].split(':$')[0]
+    if config['CodeSha256'] == code_sha256:
+        print("Lambda code is up to date.")
+        return function_arn, False
+    print("Lambda code changed. Updating function code...")
+    lambda_client.update_function_code(FunctionName=LAMBDA_FUNCTION_NAME, ZipFile=zip_bytes, Publish=True)
+    lambda_client.get_waiter('function_updated').wait(FunctionName=LAMBDA_FUNCTION_NAME)
+    return function_arn, True
 
 def create_bedrock_agent(agent_role_arn, foundation_model, instruction):
     """Creates the Bedrock Agent shell."""
@@ -73,104 +126,402 @@ def create_bedrock_agent(agent_role_arn, foundation_model, instruction):
         agent = next((a for a in agents if a['agentName'] == AGENT_NAME), None)
         return bedrock_agent_client.get_agent(agentId=agent['agentId'])['agent']
 
-if __name__ == "__main__":
-    print("--- Starting CloudCraft Agent Infrastructure Setup ---")
-    
-    # Steps 1 & 2: Create IAM roles
-    print("\nStep 1: Creating IAM Role for Lambda...")
-    lambda_trust_policy = {"Version": "2012-10-17", "Statement": [{"Effect": "Allow", "Principal": {"Service": "lambda.amazonaws.com"}, "Action": "sts:AssumeRole"}]}
-    lambda_role_arn = create_iam_role(LAMBDA_ROLE_NAME, lambda_trust_policy)
-    iam_client.attach_role_policy(RoleName=LAMBDA_ROLE_NAME, PolicyArn='arn:aws:iam::aws:policy/AmazonS3FullAccess')
-    iam_client.attach_role_policy(RoleName=LAMBDA_ROLE_NAME, PolicyArn='arn:aws:iam::aws:policy/AWSLambda_FullAccess')
-    iam_client.attach_role_policy(RoleName=LAMBDA_ROLE_NAME, PolicyArn='arn:aws:iam::aws:policy/AmazonAPIGatewayAdministrator')
-    print(f"Lambda Role ARN: {lambda_role_arn}")
+def update_agent_config(agent_id):
+    """Updates the agent's instruction and model only if they differ. Returns True if changed."""
+    agent = bedrock_agent_client.get_agent(agentId=agent_id)['agent']
+    if agent.get('instruction', '').strip() == AGENT_INSTRUCTIONS.strip() and agent['foundationModel'] == FOUNDATION_MODEL:
+        print("Agent instructions and model are up to date.")
+        return False
+    print("Agent configuration changed. Updating agent...")
+    bedrock_agent_client.update_agent(
+        agentId=agent_id, agentName=AGENT_NAME, agentResourceRoleArn=agent['agentResourceRoleArn'],
+        foundationModel=FOUNDATION_MODEL, instruction=AGENT_INSTRUCTIONS,
+        idleSessionTTLInSeconds=agent.get('idleSessionTTLInSeconds', 600),
+    )
+    # UpdateAgent leaves the agent UPDATING for a moment; it can't be changed
+    # or prepared again until that settles
+    wait_for_agent_status(agent_id, ('NOT_PREPARED', 'PREPARED'), "agent update")
+    return True
 
-    print("\nStep 2: Creating IAM Role for Bedrock Agent...")
-    agent_trust_policy = {"Version": "2012-10-17", "Statement": [{"Effect": "Allow", "Principal": {"Service": "bedrock.amazonaws.com"}, "Action": "sts:AssumeRole"}]}
-    agent_role_arn = create_iam_role(AGENT_ROLE_NAME, agent_trust_policy)
-    iam_client.put_role_policy(
-        RoleName=AGENT_ROLE_NAME, PolicyName='AllowClaude3SonnetInvoke',
-        PolicyDocument=json.dumps({"Version": "2012-10-17", "Statement": [{"Effect": "Allow", "Action": "bedrock:InvokeModel", "Resource": f"arn:aws:bedrock:{REGION}::foundation-model/anthropic.claude-3-sonnet-20240229-v1:0"}]})
+def normalize_schema(functions):
+    """The parts of a function schema we set, in a stable form for comparison."""
+    return sorted(
+        (
+            {
+                'name': f['name'],
+                'description': f.get('description'),
+                'parameters': {
+                    name: {key: spec.get(key) for key in ('description', 'type', 'required')}
+                    for name, spec in f.get('parameters', {}).items()
+                },
+            }
+            for f in functions
+        ),
+        key=lambda f: f['name'],
     )
-    print(f"Agent Role ARN: {agent_role_arn}")
-
-    print("Waiting 10 seconds for IAM roles to propagate...")
-    time.sleep(10)
-    
-    # Step 3: Create Lambda Function
-    print("\nStep 3: Creating Lambda Function...")
-    lambda_arn = create_lambda_function(lambda_role_arn)
-    print(f"Lambda Function ARN: {lambda_arn}")
-
-    # Step 4: Create the Bedrock Agent (now with instructions)
-    print("\nStep 4: Creating the Bedrock Agent...")
-    agent_details = create_bedrock_agent(agent_role_arn, "anthropic.claude-3-sonnet-20240229-v1:0", AGENT_INSTRUCTIONS)
-    agent_id = agent_details['agentId']
-    print(f"Agent created with ID: {agent_id}")
-
-    # Waiter loop
-    print("Waiting for agent to be created...")
-    while True:
-        get_agent_response = bedrock_agent_client.get_agent(agentId=agent_id)
-        agent_status = get_agent_response['agent']['agentStatus']
-        print(f"Current agent status: {agent_status}")
-        if agent_status != 'CREATING':
-            break
-        time.sleep(10)
-    
-    # Step 5: Define and create Action Group in Code
-    print("\nStep 5: Creating the Agent Action Group...")
-    try:
-        bedrock_agent_client.create_agent_action_group(
-            agentId=agent_id, agentVersion='DRAFT', actionGroupName='CloudCraftTools',
-            actionGroupExecutor={'lambda': lambda_arn},
-            functionSchema={'functions': [
-                {'name': 'create_s3_bucket', 'description': 'Creates a new Amazon S3 bucket.', 'parameters': {
-                    'bucket_name': {'description': 'Globally unique name for the bucket.', 'type': 'string', 'required': True},
-                    'region': {'description': 'The AWS region, e.g., us-east-1.', 'type': 'string', 'required': True}}},
-                {'name': 'disable_s3_block_public_access', 'description': 'Disables block public access on an S3 bucket.', 'parameters': {
-                    'bucket_name': {'description': 'Name of the S3 bucket.', 'type': 'string', 'required': True}}},
-                {'name': 'set_public_read_policy', 'description': 'Applies a public read-only policy to an S3 bucket.', 'parameters': {
-                    'bucket_name': {'description': 'Name of the S3 bucket.', 'type': 'string', 'required': True}}},
-                {'name': 'configure_s3_static_hosting', 'description': 'Enables static website hosting on a bucket.', 'parameters': {
-                    'bucket_name': {'description': 'Name of the S3 bucket.', 'type': 'string', 'required': True}}},
-                {'name': 'create_hello_world_lambda', 'description': "Creates a simple 'Hello World' Lambda function.", 'parameters': {
-                    'function_name': {'description': 'The name for the new Lambda function.', 'type': 'string', 'required': True},
-                    'role_arn': {'description': 'The ARN of the IAM role for the Lambda to assume.', 'type': 'string', 'required': True}}}
-            ]}
-        )
-        print("Action Group created successfully.")
-    except bedrock_agent_client.exceptions.ConflictException:
-        print("Action Group 'CloudCraftTools' already exists. Skipping creation.")
 
-    # Step 6: Prepare the Agent
-    print("\nStep 6: Preparing the Agent...")
+def fingerprint(value):
+    """Stable hash of a JSON-serializable value."""
+    return hashlib.sha256(json.dumps(value, sort_keys=True).encode()).hexdigest()
+
+def sync_action_group(agent_id, lambda_arn, action_group_id=None):
+    """
+    Creates the action group, or updates it only if its Lambda or function
+    schema changed. Returns (action group ID, changed).
+    """
+    function_schema_config = {'functions': function_schema()}
+    if action_group_id is None:
+        try:
+            response = bedrock_agent_client.create_agent_action_group(
+                agentId=agent_id, agentVersion='DRAFT', actionGroupName=ACTION_GROUP_NAME,
+                actionGroupExecutor={'lambda': lambda_arn},
+                functionSchema=function_schema_config
+            )
+            print("Action Group created successfully.")
+            return response['agentActionGroup']['actionGroupId'], True
+        except bedrock_agent_client.exceptions.ConflictException:
+            print(f"Action Group '{ACTION_GROUP_NAME}' already exists. Checking it.")
+            groups = bedrock_agent_client.list_agent_action_groups(agentId=agent_id, agentVersion='DRAFT')['actionGroupSummaries']
+            action_group_id = next(g['actionGroupId'] for g in groups if g['actionGroupName'] == ACTION_GROUP_NAME)
+
+    current = bedrock_agent_client.get_agent_action_group(
+        agentId=agent_id, agentVersion='DRAFT', actionGroupId=action_group_id
+    )['agentActionGroup']
+    deployed_functions = current.get('functionSchema', {}).get('functions', [])
+    if (current.get('actionGroupExecutor', {}).get('lambda') == lambda_arn
+            and normalize_schema(deployed_functions) == normalize_schema(function_schema_config['functions'])):
+        print("Action Group is up to date.")
+        return action_group_id, False
+    print("Action Group changed. Updating it...")
+    bedrock_agent_client.update_agent_action_group(
+        agentId=agent_id, agentVersion='DRAFT', actionGroupId=action_group_id,
+        actionGroupName=ACTION_GROUP_NAME, actionGroupExecutor={'lambda': lambda_arn},
+        functionSchema=function_schema_config
+    )
+    return action_group_id, True
+
+def prepare_agent(agent_id):
+    """Prepares the DRAFT agent and waits until it is PREPARED."""
     bedrock_agent_client.prepare_agent(agentId=agent_id)
     print("Agent preparation started.")
-    
-    # Wait for preparation
-    while True:
-        get_agent_response = bedrock_agent_client.get_agent(agentId=agent_id)
-        agent_status = get_agent_response['agent']['agentStatus']
-        print(f"Current agent status: {agent_status}")
-        if agent_status == 'PREPARED':
-            break
-        time.sleep(10)
-
-    # Step 7: Create an Alias
-    print("\nStep 7: Creating Agent Alias...")
-    try:
-        alias_response = bedrock_agent_client.create_agent_alias(agentId=agent_id, agentAliasName='TestAlias')
+    # prepare_agent moves the agent to PREPARING; wait for PREPARED
+    return wait_for_agent_status(agent_id, ('PREPARED',), "agent preparation")
+
+def sync_alias(agent_id):
+    """
+    Creates the alias, or points an existing one at a new version of the
+    freshly prepared DRAFT agent. Returns the alias ID.
+    """
+    aliases = bedrock_agent_client.list_agent_aliases(agentId=agent_id)['agentAliasSummaries']
+    alias = next((a for a in aliases if a['agentAliasName'] == ALIAS_NAME), None)
+    if alias is None:
+        alias_response = bedrock_agent_client.create_agent_alias(agentId=agent_id, agentAliasName=ALIAS_NAME)
         alias_id = alias_response['agentAlias']['agentAliasId']
-        print(f"Alias 'TestAlias' created with ID: {alias_id}")
-    except bedrock_agent_client.exceptions.ConflictException:
-        print("Alias 'TestAlias' already exists. Fetching ID.")
-        aliases = bedrock_agent_client.list_agent_aliases(agentId=agent_id)['agentAliasSummaries']
-        alias = next((a for a in aliases if a['agentAliasName'] == 'TestAlias'), None)
+        print(f"Alias '{ALIAS_NAME}' created with ID: {alias_id}")
+    else:
         alias_id = alias['agentAliasId']
+        # Without a routing configuration, Bedrock snapshots DRAFT into a new version
+        bedrock_agent_client.update_agent_alias(agentId=agent_id, agentAliasId=alias_id, agentAliasName=ALIAS_NAME)
+        print(f"Alias '{ALIAS_NAME}' ({alias_id}) updated to the new agent version.")
+
+    def alias_ready():
+        status = bedrock_agent_client.get_agent_alias(agentId=agent_id, agentAliasId=alias_id)['agentAlias']['agentAliasStatus']
+        if status == 'FAILED':
+            raise RuntimeError(f"Alias '{alias_id}' entered FAILED status.")
+        return status == 'PREPARED'
+    wait_until(alias_ready, "the agent alias")
+    return alias_id
+
+# --- State ---
+
+def load_state():
+    try:
+        with open(STATE_FILE) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def save_state(state):
+    with open(STATE_FILE, 'w') as f:
+        json.dump(state, f, indent=2, sort_keys=True)
+
+def write_app_config(agent_id, alias_id):
+    """Writes the agent IDs where backend/app.py picks them up at startup."""
+    with open(APP_CONFIG_FILE, 'w') as f:
+        json.dump({'AGENT_ID': agent_id, 'AGENT_ALIAS_ID': alias_id, 'REGION': REGION}, f, indent=2)
+
+def local_hashes(package):
+    """Content hashes of everything this script deploys."""
+    return {
+        'lambdaCodeSha256': package[1],
+        'agentConfigHash': fingerprint({'instruction': AGENT_INSTRUCTIONS.strip(), 'model': FOUNDATION_MODEL}),
+        'actionGroupSchemaHash': fingerprint(normalize_schema(function_schema())),
+    }
+
+def backoff_delays(initial=WAIT_INITIAL_DELAY, maximum=WAIT_MAX_DELAY):
+    """Exponential backoff with "equal jitter": half fixed, half random."""
+    delay = initial
+    while True:
+        yield delay / 2 + random.uniform(0, delay / 2)
+        delay = min(delay * 2, maximum)
+
+def wait_until(probe, description, timeout=WAIT_TIMEOUT):
+    """Calls probe() until it returns a truthy value, backing off between tries."""
+    deadline = time.monotonic() + timeout
+    for delay in backoff_delays():
+        result = probe()
+        if result:
+            return result
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise TimeoutError(f"Timed out after {timeout:.0f}s waiting for {description}.")
+        time.sleep(min(delay, remaining))
+
+def retry_while(call, is_retryable, description, timeout=WAIT_TIMEOUT):
+    """
+    Calls call() and retries with backoff while it raises an error that
+    is_retryable(error) accepts. Used where the only readiness signal is the
+    call itself succeeding, e.g. a freshly created IAM role that Lambda or
+    Bedrock cannot assume yet.
+    """
+    deadline = time.monotonic() + timeout
+    for delay in backoff_delays():
+        try:
+            return call()
+        except Exception as e:
+            remaining = deadline - time.monotonic()
+            if not is_retryable(e) or remaining <= 0:
+                raise
+            print(f"{description} not ready yet ({e.__class__.__name__}); retrying in {delay:.1f}s...")
+            time.sleep(min(delay, remaining))
+
+def role_not_ready(error):
+    """True for the errors AWS returns while a new IAM role is still propagating."""
+    message = str(error).lower()
+    return 'role' in message and ('assume' in message or 'not authorized' in message or 'invalid' in message)
+
+def wait_for_agent_status(agent_id, ready_statuses, description):
+    """Polls get_agent until the agent reaches one of ready_statuses."""
+    def probe():
+        status = bedrock_agent_client.get_agent(agentId=agent_id)['agent']['agentStatus']
+        print(f"Current agent status: {status}")
+        if status == 'FAILED':
+            raise RuntimeError(f"Agent '{agent_id}' entered FAILED status while waiting for {description}.")
+        return status if status in ready_statuses else None
+    return wait_until(probe, description)
+
+# --- Dependency Graph ---
+
+def run_graph(steps, max_workers=8):
+    """
+    Runs steps as soon as their dependencies are done, in parallel.
+    steps maps name -> (dependency names, fn); fn receives the dict of
+    results so far and returns this step's result. Returns (results, timings).
+    """
+    results = {}
+    timings = {}
+    lock = threading.Lock()
+    started_at = time.perf_counter()
+    pending = dict(steps)
+    running = {}
+
+    def run(name, fn):
+        step_started_at = time.perf_counter()
+        try:
+            with lock:
+                inputs = dict(results)
+            return fn(inputs)
+        finally:
+            timings[name] = (step_started_at - started_at, time.perf_counter() - step_started_at)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        failure = None
+        while pending or running:
+            if failure is None:
+                for name, (deps, fn) in list(pending.items()):
+                    if all(dep in results for dep in deps):
+                        running[pool.submit(run, name, fn)] = name
+                        del pending[name]
+            if not running:
+                if pending and failure is None:
+                    failure = RuntimeError(f"Steps with unmet dependencies: {', '.join(pending)}")
+                break
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                try:
+                    value = future.result()
+                except Exception as e:
+                    print(f"Step '{name}' failed: {e}")
+                    failure = failure or e
+                    continue
+                with lock:
+                    results[name] = value
+    print_timing_report(steps, timings, time.perf_counter() - started_at)
+    if failure is not None:
+        raise failure
+    return results, timings
+
+def print_timing_report(steps, timings, total):
+    print("\n--- Step Timing ---")
+    print(f"{'step':<28}{'start':>9}{'duration':>10}")
+    for name in sorted(steps, key=lambda n: timings.get(n, (float('inf'), 0))[0]):
+        if name in timings:
+            start, duration = timings[name]
+            print(f"{name:<28}{start:>8.1f}s{duration:>9.1f}s")
+        else:
+            print(f"{name:<28}{'-':>9}{'not run':>10}")
+    print(f"{'total':<28}{'':>9}{total:>9.1f}s")
+
+def provisioning_steps(package):
+    """The full setup as a dependency graph: step name -> (dependencies, fn)."""
+    lambda_trust_policy = {"Version": "2012-10-17", "Statement": [{"Effect": "Allow", "Principal": {"Service": "lambda.amazonaws.com"}, "Action": "sts:AssumeRole"}]}
+    agent_trust_policy = {"Version": "2012-10-17", "Statement": [{"Effect": "Allow", "Principal": {"Service": "bedrock.amazonaws.com"}, "Action": "sts:AssumeRole"}]}
+    lambda_policies = {
+        'attach_s3_policy': 'arn:aws:iam::aws:policy/AmazonS3FullAccess',
+        'attach_lambda_policy': 'arn:aws:iam::aws:policy/AWSLambda_FullAccess',
+        'attach_apigw_policy': 'arn:aws:iam::aws:policy/AmazonAPIGatewayAdministrator',
+    }
+
+    def lambda_role(_):
+        arn = create_iam_role(LAMBDA_ROLE_NAME, lambda_trust_policy)
+        print(f"Lambda Role ARN: {arn}")
+        return arn
+
+    def agent_role(_):
+        arn = create_iam_role(AGENT_ROLE_NAME, agent_trust_policy)
+        print(f"Agent Role ARN: {arn}")
+        return arn
+
+    def attach(policy_arn):
+        return lambda _: iam_client.attach_role_policy(RoleName=LAMBDA_ROLE_NAME, PolicyArn=policy_arn)
+
+    def agent_model_policy(_):
+        iam_client.put_role_policy(
+            RoleName=AGENT_ROLE_NAME, PolicyName='AllowClaude3SonnetInvoke',
+            PolicyDocument=json.dumps({"Version": "2012-10-17", "Statement": [{"Effect": "Allow", "Action": "bedrock:InvokeModel", "Resource": f"arn:aws:bedrock:{REGION}::foundation-model/{FOUNDATION_MODEL}"}]})
+        )
+
+    def lambda_function(results):
+        # A new role can take a few seconds before Lambda is allowed to assume it
+        arn = retry_while(lambda: create_lambda_function(results['lambda_role'], package), role_not_ready, "Lambda execution role")
+        print(f"Lambda Function ARN: {arn}")
+        return arn
+
+    def agent(results):
+        details = retry_while(
+            lambda: create_bedrock_agent(results['agent_role'], FOUNDATION_MODEL, AGENT_INSTRUCTIONS),
+            role_not_ready, "Agent service role"
+        )
+        print(f"Agent created with ID: {details['agentId']}")
+        return details['agentId']
+
+    def agent_created(results):
+        return wait_for_agent_status(results['agent'], ('NOT_PREPARED', 'PREPARED'), "agent creation")
+
+    # The action group waits for agent_config: neither it nor prepare may
+    # touch the agent while an update leaves it UPDATING
+    def action_group(results):
+        action_group_id, _ = sync_action_group(results['agent'], results['lambda_function'])
+        return action_group_id
+
+    def prepared(results):
+        return prepare_agent(results['agent'])
+
+    def alias(results):
+        return sync_alias(results['agent'])
+
+    steps = {
+        # IAM roles are independent of each other
+        'lambda_role': ((), lambda_role),
+        'agent_role': ((), agent_role),
+        'agent_model_policy': (('agent_role',), agent_model_policy),
+        # The Lambda function overlaps with agent creation
+        'lambda_function': (('lambda_role', *lambda_policies), lambda_function),
+        'agent': (('agent_role', 'agent_model_policy'), agent),
+        'agent_created': (('agent',), agent_created),
+        'action_group': (('agent_created', 'lambda_function'), action_group),
+        'prepared': (('action_group',), prepared),
+        'alias': (('prepared',), alias),
+    }
+    # The three policy attachments run in parallel once the role exists
+    for name, policy_arn in lambda_policies.items():
+        steps[name] = (('lambda_role',), attach(policy_arn))
+    return steps
+
+def reprovisioning_steps(package, state):
+    """
+    Incremental update as a dependency graph. Each step compares what is
+    deployed with the local code and configuration and only calls AWS to
+    change what differs. The agent is only re-prepared, and the alias only
+    moved, if the agent or its action group actually changed.
+    """
+    agent_id = state['agentId']
+
+    def lambda_code(_):
+        function_arn, changed = update_lambda_code(package)
+        return {'arn': function_arn, 'changed': changed}
+
+    def agent_config(_):
+        return update_agent_config(agent_id)
+
+    def action_group(results):
+        action_group_id, changed = sync_action_group(agent_id, results['lambda_code']['arn'], state.get('actionGroupId'))
+        return {'id': action_group_id, 'changed': changed}
+
+    def prepared(results):
+        if not (results['agent_config'] or results['action_group']['changed']):
+            print("Agent unchanged. Skipping prepare.")
+            return False
+        prepare_agent(agent_id)
+        return True
+
+    def alias(results):
+        if not results['prepared'] and state.get('agentAliasId'):
+            return state['agentAliasId']
+        return sync_alias(agent_id)
+
+    return {
+        'lambda_code': ((), lambda_code),
+        'agent_config': ((), agent_config),
+        'action_group': (('lambda_code', 'agent_config'), action_group),
+        'prepared': (('agent_config', 'action_group'), prepared),
+        'alias': (('prepared',), alias),
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Provision or incrementally update the CloudCraft Agent infrastructure.")
+    parser.add_argument('--full', action='store_true',
+                        help="run the full provisioning even if a previous run was recorded in the state file")
+    args = parser.parse_args()
+
+    package = build_lambda_package()
+    hashes = local_hashes(package)
+    state = load_state()
+
+    if state.get('agentId') and not args.full:
+        print("--- Updating CloudCraft Agent Infrastructure (incremental) ---")
+        changed = [name for name, value in hashes.items() if state.get(name) != value]
+        print(f"Changed since the last run: {', '.join(changed) if changed else 'nothing (checking for drift)'}")
+        results, _ = run_graph(reprovisioning_steps(package, state))
+        agent_id = state['agentId']
+        state.update(
+            actionGroupId=results['action_group']['id'],
+            lambdaFunctionArn=results['lambda_code']['arn'],
+        )
+    else:
+        print("--- Starting CloudCraft Agent Infrastructure Setup ---")
+        results, _ = run_graph(provisioning_steps(package))
+        agent_id = results['agent']
+        state.update(actionGroupId=results['action_group'], lambdaFunctionArn=results['lambda_function'])
+    alias_id = results['alias']
+
+    state.update(hashes, agentId=agent_id, agentAliasId=alias_id, updatedAt=time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()))
+    save_state(state)
+    write_app_config(agent_id, alias_id)
 
     print("\n--- Setup Complete! ---")
-    print("Please use the following values in your backend/app.py file:")
+    print(f"Agent IDs written to {os.path.relpath(APP_CONFIG_FILE, BASE_DIR)} (used by backend/app.py):")
     print(f'AGENT_ID = "{agent_id}"')
     print(f'AGENT_ALIAS_ID = "{alias_id}"')
-    print("---------------------------------")
\ No newline at end of file
+    print("---------------------------------")
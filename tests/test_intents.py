@@ -0,0 +1,44 @@
+# tests/test_intents.py
+# The fast path turns chat prompts straight into AWS calls, so its grammar
+# must match exactly what it should and let everything else reach the agent.
+import pytest
+
+from backend.intents import match_intent, valid_bucket_name
+
+CASES = [
+    # (prompt, expected (tool, arguments) or None for "send to the agent")
+    ("deploy a static website named acme-preview-42 in us-east-1",
+     ('deploy_static_site', {'bucket_name': 'acme-preview-42', 'region': 'us-east-1'})),
+    ("Please create an S3 bucket called logs.example.com in eu-west-1.",
+     ('create_s3_bucket', {'bucket_name': 'logs.example.com', 'region': 'eu-west-1'})),
+    ("deploy static sites named a1b, b2c and c3d",
+     ('deploy_static_sites', {'bucket_names': ['a1b', 'b2c', 'c3d'], 'region': 'us-east-1'})),
+    ("deploy static sites named a1b, b2c, and c3d in eu-west-1",
+     ('deploy_static_sites', {'bucket_names': ['a1b', 'b2c', 'c3d'], 'region': 'eu-west-1'})),
+    # "and" inside a name is part of the name
+    ("deploy static sites named my-and-site, foo-site",
+     ('deploy_static_sites', {'bucket_names': ['my-and-site', 'foo-site'], 'region': 'us-east-1'})),
+    ("deploy static sites named foo.and.bar, baz",
+     ('deploy_static_sites', {'bucket_names': ['foo.and.bar', 'baz'], 'region': 'us-east-1'})),
+    ("create a hello world lambda named greeter with role arn:aws:iam::123456789012:role/exec",
+     ('create_hello_world_lambda', {'function_name': 'greeter', 'role_arn': 'arn:aws:iam::123456789012:role/exec'})),
+    # Invalid or ambiguous names fall through to the agent
+    ("deploy static sites named abc and -bad", None),
+    ("create a bucket named Bad_Name", None),
+    ("create a bucket named 192.168.1.1", None),
+    ("deploy a static website named foo..bar", None),
+    ("deploy a static website for my bakery", None),
+    ("create a bucket named logs and then upload my files", None),
+]
+
+@pytest.mark.parametrize("prompt, expected", CASES)
+def test_match_intent(prompt, expected):
+    assert match_intent(prompt) == expected
+
+@pytest.mark.parametrize("name, valid", [
+    ('abc', True), ('my-and-site', True), ('a.b.c', True),
+    ('ab', False), ('-abc', False), ('abc-', False), ('.abc', False), ('abc.', False),
+    ('a..b', False), ('a.-b', False), ('ABC', False), ('10.0.0.1', False), ('a' * 64, False),
+])
+def test_valid_bucket_name(name, valid):
+    assert valid_bucket_name(name) is valid